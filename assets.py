@@ -0,0 +1,180 @@
+import os
+from collections import OrderedDict
+from functools import partial
+
+import pygame
+
+from game_core import GRID_SIZE, Direction
+
+# Sprite registry for the pygame front-end. Every sprite is built (or
+# loaded from ASSETS_DIR) once, converted to the display's pixel format
+# and then shared by everything that draws it.
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+IMAGE_EXTENSIONS = (".png", ".bmp", ".gif", ".jpg")
+
+BLACK = (0, 0, 0)
+SHIELD_COLOR = (0, 255, 255)
+
+# Placeholder colors used when there is no image file for a sprite
+PLACEHOLDER_COLORS = {
+    "snake_head": (0, 255, 0),
+    "snake_body": (0, 200, 0),
+    "rival_head": (255, 140, 0),  # Other players' snakes on a shared board
+    "rival_body": (200, 110, 0),
+    "strawberry": (255, 0, 0),
+    "invader": (128, 0, 128),
+    "bullet": (255, 255, 0),
+    "speed_powerup": (0, 0, 255),
+    "shield_powerup": (0, 255, 255),
+    "bullet_powerup": (255, 165, 0),
+}
+
+# Eye positions on the head for each direction, in thirds of GRID_SIZE
+EYES = {
+    Direction.UP: ((1, 1), (2, 1)),
+    Direction.DOWN: ((1, 2), (2, 2)),
+    Direction.LEFT: ((1, 1), (1, 2)),
+    Direction.RIGHT: ((2, 1), (2, 2)),
+}
+
+def load_image(name, size=(GRID_SIZE, GRID_SIZE)):
+    # Placeholder sprite: a rectangle filled with the sprite's color
+    image = pygame.Surface(size)
+    color = PLACEHOLDER_COLORS.get(name)
+    if color is not None:
+        image.fill(color)
+    return image
+
+def _display_ready():
+    return pygame.display.get_init() and pygame.display.get_surface() is not None
+
+class AssetCache:
+    # LRU-bounded cache of display-ready surfaces keyed by (name, size, variant)
+    def __init__(self, assets_dir=ASSETS_DIR, max_entries=128):
+        self.assets_dir = assets_dir
+        self.max_entries = max_entries
+        self._surfaces = OrderedDict()
+
+    def __len__(self):
+        return len(self._surfaces)
+
+    def image(self, name, size=(GRID_SIZE, GRID_SIZE)):
+        return self._get((name, size, None), self._build_image)
+
+    def head(self, direction, name="snake_head"):
+        # Snake head with the eyes for `direction` already drawn on
+        return self._get((name, (GRID_SIZE, GRID_SIZE), direction), self._build_head)
+
+    def shield(self):
+        size = (GRID_SIZE + 4, GRID_SIZE + 4)
+        return self._get(("shield", size, None), self._build_shield)
+
+    def preload(self, names):
+        for job in self.preload_jobs(names):
+            job()
+
+    def preload_jobs(self, names):
+        # preload() as a list of small calls, to spread over idle time
+        jobs = [partial(self.image, name) for name in names]
+        jobs.extend(partial(self.head, direction) for direction in Direction)
+        jobs.append(self.shield)
+        return jobs
+
+    def clear(self):
+        self._surfaces.clear()
+
+    def _get(self, key, build):
+        surfaces = self._surfaces
+        surface = surfaces.get(key)
+        if surface is not None:
+            surfaces.move_to_end(key)
+            return surface
+
+        surface = build(*key)
+        surfaces[key] = surface
+        if len(surfaces) > self.max_entries:
+            surfaces.popitem(last=False)
+        return surface
+
+    def _find_file(self, name):
+        for extension in IMAGE_EXTENSIONS:
+            path = os.path.join(self.assets_dir, name + extension)
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def _build_image(self, name, size, variant):
+        path = self._find_file(name)
+        if path is not None:
+            try:
+                image = pygame.image.load(path)
+                if _display_ready():
+                    image = image.convert_alpha()
+                if image.get_size() != size:
+                    image = pygame.transform.scale(image, size)
+                return image
+            except pygame.error as e:
+                print(f"Couldn't load image: {e}")
+
+        image = load_image(name, size)
+        return image.convert() if _display_ready() else image
+
+    def _build_head(self, name, size, direction):
+        image = self.image(name, size).copy()
+        for fx, fy in EYES[direction]:
+            pygame.draw.circle(image, BLACK, (fx * GRID_SIZE // 3, fy * GRID_SIZE // 3), 2)
+        return image
+
+    def _build_shield(self, name, size, variant):
+        image = pygame.Surface(size, pygame.SRCALPHA)
+        pygame.draw.rect(image, SHIELD_COLOR, image.get_rect(), 2)
+        return image.convert_alpha() if _display_ready() else image
+
+class TextCache:
+    # Fonts are created once per size and rendered text is cached by
+    # (text, size, color), LRU-bounded. Counters such as the score go
+    # through render_value() so they are only re-rendered on change.
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._fonts = {}
+        self._surfaces = OrderedDict()
+        self._values = {}
+
+    def font(self, size):
+        font = self._fonts.get(size)
+        if font is None:
+            if not pygame.font.get_init():
+                pygame.font.init()  # On first use, so nothing else pays for it
+            # Font(None, ...) is the default font SysFont(None, ...) falls
+            # back to, without scanning the system font list first
+            font = pygame.font.Font(None, size)
+            self._fonts[size] = font
+        return font
+
+    def render(self, text, size, color):
+        key = (text, size, color)
+        surfaces = self._surfaces
+        surface = surfaces.get(key)
+        if surface is not None:
+            surfaces.move_to_end(key)
+            return surface
+
+        surface = self.font(size).render(text, True, color)
+        surfaces[key] = surface
+        if len(surfaces) > self.max_entries:
+            surfaces.popitem(last=False)
+        return surface
+
+    def render_value(self, slot, template, value, size, color):
+        # Text for a named HUD slot, re-rendered only when value changes
+        cached = self._values.get(slot)
+        if cached is not None and cached[0] == value:
+            return cached[1]
+        surface = self.font(size).render(template.format(value), True, color)
+        self._values[slot] = (value, surface)
+        return surface
+
+    def clear(self):
+        self._surfaces.clear()
+        self._values.clear()
@@ -0,0 +1,385 @@
+import numpy as np
+
+from game_core import (
+    GRID_SIZE, GRID_WIDTH, GRID_HEIGHT, SNAKE_SPEED, SPEED_BOOST, INVADER_SPEED, BULLET_SPEED,
+    SIM_RATE, FRAME_TICKS,
+    INVADER_SPAWN_RATE, MAX_INVADERS, INVADER_FIRE_RATE, LEVEL_SPAWN_RATE_STEP, LEVEL_SPEED_STEP,
+    Direction,
+)
+
+# Vectorized Cosmic Snake: thousands of games advanced with one NumPy call.
+#
+# The rules are game_core's, but every game lives in a row of fixed-size
+# arrays instead of a GameState full of Python objects, and one step is
+# one frame of the original loop (one snake move) rather than one
+# SIM_RATE tick, which is what training code wants to act on. A step
+# lasts as long as that move takes (less with the speed boost), and
+# everything else moves, counts down and spawns by that much game time.
+# The snake body is stored as "move stamps": stamp[env, cell] is the
+# move number at which the head entered that cell, so a cell belongs to
+# the body when moves - stamp < length. Moving the snake is then a
+# single write per game instead of touching every segment.
+
+# Action codes: 0 keeps the current heading, 1-4 follow ACTION_DIRECTIONS
+ACTION_DIRECTIONS = (None, Direction.UP, Direction.DOWN, Direction.LEFT, Direction.RIGHT)
+_DX = np.array([0, 0, 0, -1, 1], dtype=np.int32)
+_DY = np.array([0, -1, 1, 0, 0], dtype=np.int32)
+_OPPOSITE = np.array([0, 2, 1, 4, 3], dtype=np.int8)
+_RIGHT = 4
+
+# Cell codes returned by observe()
+EMPTY, BODY, HEAD, STRAWBERRY, INVADER, POWERUP, BULLET = range(7)
+
+# Powerup codes (same order as PowerUpType)
+SPEED, SHIELD, BULLET_POWER = range(3)
+
+_NEVER = -(1 << 30)
+_BULLET_HALF_HEIGHT = 5
+_SHOT_COOLDOWN = 500  # milliseconds of simulation time
+
+def _odds(p, frames):
+    # Chance of an event with per-frame odds p in a step of `frames` frames
+    return 1.0 - (1.0 - p) ** frames
+
+class BatchCosmicSnake:
+    def __init__(self, n_envs, width=GRID_WIDTH, height=GRID_HEIGHT,
+                 max_invaders=MAX_INVADERS, max_powerups=8, max_bullets=32, seed=None):
+        self.n_envs = n_envs
+        self.width = width
+        self.height = height
+        self.cells = width * height
+        self.pixel_height = height * GRID_SIZE
+        self.max_invaders = max_invaders
+        self.rng = np.random.default_rng(seed)
+        self._rows = np.arange(n_envs)
+
+        n = n_envs
+        # Snake
+        self.stamp = np.full((n, self.cells), _NEVER, dtype=np.int32)
+        self.moves = np.zeros(n, dtype=np.int32)
+        self.length = np.ones(n, dtype=np.int32)
+        self.head = np.zeros(n, dtype=np.int32)
+        self.direction = np.full(n, _RIGHT, dtype=np.int8)
+        self.next_direction = np.full(n, _RIGHT, dtype=np.int8)
+        self.growing = np.zeros(n, dtype=bool)
+
+        # Powerup timers, in SIM_RATE ticks like Snake's; a step takes off
+        # the ticks it lasted
+        self.speed_boost = np.zeros(n, dtype=np.int32)
+        self.shield_timer = np.zeros(n, dtype=np.int32)
+        self.bullet_timer = np.zeros(n, dtype=np.int32)
+        self.time = np.zeros(n, dtype=np.float64)
+        self.last_shot_time = np.zeros(n, dtype=np.float64)
+
+        # Game progress
+        self.strawberry = np.zeros(n, dtype=np.int32)  # cell index, -1 when the board is full
+        self.score = np.zeros(n, dtype=np.int64)
+        self.level = np.ones(n, dtype=np.int32)
+        self.ticks = np.zeros(n, dtype=np.int64)
+        self.spawn_rate = np.zeros(n, dtype=np.float64)
+        self.speed_multiplier = np.ones(n, dtype=np.float64)
+
+        # Entities, one fixed-size slot table per kind
+        self.inv_x = np.zeros((n, max_invaders), dtype=np.int32)
+        self.inv_y = np.zeros((n, max_invaders), dtype=np.float64)
+        self.inv_speed = np.zeros((n, max_invaders), dtype=np.float64)  # Cells per second
+        self.inv_alive = np.zeros((n, max_invaders), dtype=bool)
+        self.pu_x = np.zeros((n, max_powerups), dtype=np.int32)
+        self.pu_y = np.zeros((n, max_powerups), dtype=np.float64)
+        self.pu_type = np.zeros((n, max_powerups), dtype=np.int8)
+        self.pu_alive = np.zeros((n, max_powerups), dtype=bool)
+        # Snake bullets travel up, invader bullets travel down
+        self.up_x = np.zeros((n, max_bullets), dtype=np.int32)
+        self.up_y = np.zeros((n, max_bullets), dtype=np.float64)
+        self.up_alive = np.zeros((n, max_bullets), dtype=bool)
+        self.down_x = np.zeros((n, max_bullets), dtype=np.int32)
+        self.down_y = np.zeros((n, max_bullets), dtype=np.float64)
+        self.down_alive = np.zeros((n, max_bullets), dtype=bool)
+
+        # Score of the last finished game in each env
+        self.episode_scores = np.zeros(n, dtype=np.int64)
+
+        self.reset()
+
+    def reset(self, mask=None):
+        if mask is None:
+            mask = np.ones(self.n_envs, dtype=bool)
+        envs = np.flatnonzero(mask)
+        if not len(envs):
+            return
+
+        self.stamp[envs] = _NEVER
+        self.moves[envs] = 0
+        self.length[envs] = 1
+        self.head[envs] = (self.height // 2) * self.width + self.width // 2
+        self.stamp[envs, self.head[envs]] = 0
+        self.direction[envs] = _RIGHT
+        self.next_direction[envs] = _RIGHT
+        self.growing[envs] = False
+
+        self.speed_boost[envs] = 0
+        self.shield_timer[envs] = 0
+        self.bullet_timer[envs] = 0
+        self.time[envs] = 0.0
+        self.last_shot_time[envs] = -_SHOT_COOLDOWN
+
+        self.score[envs] = 0
+        self.level[envs] = 1
+        self.ticks[envs] = 0
+        self.spawn_rate[envs] = INVADER_SPAWN_RATE
+        self.speed_multiplier[envs] = 1.0
+
+        self.inv_alive[envs] = False
+        self.pu_alive[envs] = False
+        self.up_alive[envs] = False
+        self.down_alive[envs] = False
+
+        self._place_strawberries(envs)
+
+    def body_mask(self, envs=None):
+        # (len(envs), cells) bool: cells covered by each snake
+        if envs is None:
+            envs = self._rows
+        return (self.moves[envs, None] - self.stamp[envs]) < self.length[envs, None]
+
+    def _place_strawberries(self, envs):
+        # Uniform over free cells: the free cell with the largest random key wins
+        free = ~self.body_mask(envs)
+        rows = np.arange(len(envs))
+        for alive, xs, ys in ((self.inv_alive, self.inv_x, self.inv_y),
+                              (self.pu_alive, self.pu_x, self.pu_y)):
+            r, slot = np.nonzero(alive[envs])
+            cell = ys[envs[r], slot].astype(np.int32) * self.width + xs[envs[r], slot]
+            free[r, cell] = False
+        keys = np.where(free, self.rng.random(free.shape), -1.0)
+        best = keys.argmax(axis=1)
+        self.strawberry[envs] = np.where(keys[rows, best] >= 0, best, -1)
+
+    def step(self, actions, shoot=None):
+        # Advance every game by one tick. actions holds direction codes
+        # (0-4), shoot an optional bool per env. Returns (rewards, dones);
+        # finished games are reset before returning.
+        n = self.n_envs
+        rows = self._rows
+        rng = self.rng
+        width = self.width
+        old_score = self.score.copy()
+
+        # Direction changes; reversing is only allowed while the snake is one cell long
+        actions = np.asarray(actions, dtype=np.int8)
+        turn = (actions > 0) & ((self.length == 1) | (actions != _OPPOSITE[self.direction]))
+        self.next_direction = np.where(turn, actions, self.next_direction)
+
+        hx = self.head % width
+        hy = self.head // width
+
+        # Shooting happens before the move, from the current head
+        if shoot is not None:
+            fire = (np.asarray(shoot, dtype=bool) & (self.bullet_timer > 0)
+                    & (self.time - self.last_shot_time >= _SHOT_COOLDOWN))
+            self.last_shot_time = np.where(fire, self.time, self.last_shot_time)
+            self._add_bullets(self.up_x, self.up_y, self.up_alive, fire[:, None],
+                              (hx * GRID_SIZE + GRID_SIZE // 2)[:, None],
+                              (hy * GRID_SIZE)[:, None])
+
+        # Game time this move takes, in ticks and seconds, and in frames of
+        # the original loop for the per-frame spawn and fire odds
+        elapsed = SIM_RATE // (SNAKE_SPEED + (self.speed_boost > 0) * SPEED_BOOST)
+        dt = elapsed / SIM_RATE
+        frames = elapsed / FRAME_TICKS
+        self.time += elapsed * 1000.0 / SIM_RATE
+        self.ticks += 1
+
+        # Move snakes; hitting the body blocks the move, which is fatal without a shield
+        shield = self.shield_timer > 0
+        nd = self.next_direction
+        new_x = (hx + _DX[nd]) % width
+        new_y = (hy + _DY[nd]) % self.height
+        new_head = new_y * width + new_x
+        hit_self = ((self.moves - self.stamp[rows, new_head]) < self.length) & (new_head != self.head)
+        dead = hit_self & ~shield
+        moved = ~hit_self
+        self.moves += moved
+        self.stamp[rows[moved], new_head[moved]] = self.moves[moved]
+        self.head = np.where(moved, new_head, self.head)
+        self.direction = np.where(moved, nd, self.direction)
+        self.length += moved & self.growing
+        self.growing &= ~moved
+        live = ~dead
+
+        # Update powerup timers
+        self.speed_boost = np.maximum(self.speed_boost - elapsed, 0)
+        self.shield_timer = np.maximum(self.shield_timer - elapsed, 0)
+        self.bullet_timer = np.maximum(self.bullet_timer - elapsed, 0)
+        shield = self.shield_timer > 0
+
+        hx = self.head % width
+        hy = self.head // width
+
+        # Strawberries
+        eat = live & (self.head == self.strawberry)
+        if eat.any():
+            self.growing |= eat
+            self.score += eat * 10
+            self._place_strawberries(np.flatnonzero(eat))
+            level_up = eat & (self.score % 50 == 0)
+            self.level += level_up
+            self.spawn_rate += level_up * LEVEL_SPAWN_RATE_STEP
+            self.speed_multiplier += level_up * LEVEL_SPEED_STEP
+
+        # The board was full last time; try again now that cells may have freed up
+        retry = live & ~eat & (self.strawberry < 0)
+        if retry.any():
+            self._place_strawberries(np.flatnonzero(retry))
+
+        # Spawn invaders and powerups
+        rolls = rng.random((n, 2))
+        spawn = (live & (self.inv_alive.sum(axis=1) < self.max_invaders)
+                 & (rolls[:, 0] < _odds(self.spawn_rate, frames)))
+        slot = self._spawn(self.inv_x, self.inv_y, self.inv_alive, spawn)
+        if slot is not None:
+            envs, slots = slot
+            self.inv_speed[envs, slots] = INVADER_SPEED * self.speed_multiplier[envs]
+        spawn_pu = live & (rolls[:, 1] < _odds(0.1 * self.spawn_rate, frames))
+        slot = self._spawn(self.pu_x, self.pu_y, self.pu_alive, spawn_pu)
+        if slot is not None:
+            envs, slots = slot
+            self.pu_type[envs, slots] = rng.integers(0, 3, len(envs))
+
+        # Move invaders; the head destroys them with a shield and dies without one
+        self.inv_y += self.inv_speed * dt[:, None]
+        iy = self.inv_y.astype(np.int32)
+        self.inv_alive &= iy < self.height
+        on_head = self.inv_alive & (self.inv_x == hx[:, None]) & (iy == hy[:, None]) & live[:, None]
+        shielded = on_head & shield[:, None]
+        self.inv_alive &= ~shielded
+        self.score += shielded.sum(axis=1) * 5
+        dead |= on_head.any(axis=1) & ~shield
+
+        # Invaders fire
+        fire = self.inv_alive & (rng.random(self.inv_alive.shape) < _odds(INVADER_FIRE_RATE, frames)[:, None])
+        if fire.any():
+            self._add_bullets(self.down_x, self.down_y, self.down_alive, fire,
+                              self.inv_x * GRID_SIZE + GRID_SIZE // 2,
+                              iy * GRID_SIZE + GRID_SIZE)
+
+        # Move powerups and collect the ones under the head
+        self.pu_y += (INVADER_SPEED * 0.8 * dt)[:, None]
+        py = self.pu_y.astype(np.int32)
+        self.pu_alive &= py < self.height
+        got = self.pu_alive & (self.pu_x == hx[:, None]) & (py == hy[:, None]) & live[:, None]
+        if got.any():
+            self.pu_alive &= ~got
+            self.score += got.sum(axis=1) * 15
+            kinds = got[:, :, None] & (self.pu_type[:, :, None] == np.arange(3))
+            kinds = kinds.any(axis=1)
+            self.speed_boost = np.where(kinds[:, SPEED], 5 * SIM_RATE, self.speed_boost)
+            self.shield_timer = np.where(kinds[:, SHIELD], 5 * SIM_RATE, self.shield_timer)
+            self.bullet_timer = np.where(kinds[:, BULLET_POWER], 10 * SIM_RATE, self.bullet_timer)
+
+        self._update_bullets(live, shield, dead, dt)
+
+        rewards = (self.score - old_score).astype(np.float32)
+        dones = dead
+        if dones.any():
+            self.episode_scores[dones] = self.score[dones]
+            self.reset(dones)
+        return rewards, dones
+
+    def _update_bullets(self, live, shield, dead, dt):
+        height = self.height
+        step = (BULLET_SPEED * dt)[:, None]
+        self.up_y -= step
+        self.up_alive &= self.up_y >= 0
+        self.down_y += step
+        self.down_alive &= self.down_y <= self.pixel_height
+
+        # Snake bullets against invaders. A bullet is one column wide, so it
+        # hits an invader in its column whose cell overlaps it vertically.
+        envs = np.flatnonzero(self.up_alive.any(axis=1) & self.inv_alive.any(axis=1) & live)
+        if len(envs):
+            by = self.up_y[envs].astype(np.int32)[:, :, None]
+            top = self.inv_y[envs].astype(np.int32)[:, None, :] * GRID_SIZE
+            hits = (self.up_alive[envs][:, :, None] & self.inv_alive[envs][:, None, :]
+                    & ((self.up_x[envs] // GRID_SIZE)[:, :, None] == self.inv_x[envs][:, None, :])
+                    & (top < by + _BULLET_HALF_HEIGHT) & (by - _BULLET_HALF_HEIGHT < top + GRID_SIZE))
+            # Each bullet takes the first invader it hits; when several bullets
+            # claim the same invader only the earliest one is spent
+            first = hits.argmax(axis=2)
+            hit = hits.any(axis=2)
+            claim = hit[:, :, None] & (first[:, :, None] == np.arange(hits.shape[2]))
+            winner = claim & (np.cumsum(claim, axis=1) == 1)
+            killed = winner.any(axis=1)
+            spent = winner.any(axis=2)
+            self.up_alive[envs] &= ~spent
+            self.inv_alive[envs] &= ~killed
+            self.score[envs] += killed.sum(axis=1) * 20
+
+        # Invader bullets against the snake: look up the (at most two)
+        # cells the bullet overlaps in its column
+        if self.down_alive.any():
+            rows = self._rows[:, None]
+            col = self.down_x // GRID_SIZE
+            down_y = self.down_y.astype(np.int32)
+            head_hit = np.zeros(self.down_alive.shape, dtype=bool)
+            body_hit = np.zeros(self.down_alive.shape, dtype=bool)
+            age_limit = self.length[:, None]
+            for edge in (-_BULLET_HALF_HEIGHT, _BULLET_HALF_HEIGHT - 1):
+                row = (down_y + edge) // GRID_SIZE
+                inside = self.down_alive & (row >= 0) & (row < height)
+                cell = np.clip(row, 0, height - 1) * self.width + col
+                age = self.moves[:, None] - self.stamp[rows, cell]
+                body_hit |= inside & (age < age_limit)
+                head_hit |= inside & (cell == self.head[:, None])
+            blocked = head_hit & shield[:, None]
+            self.down_alive &= ~blocked
+            dead |= ((head_hit & ~shield[:, None]) | (body_hit & ~head_hit)).any(axis=1) & live
+
+    def _spawn(self, xs, ys, alive, mask):
+        # Put one new entity at the top of the board in each masked env
+        mask = mask & ~alive.all(axis=1)
+        envs = np.flatnonzero(mask)
+        if not len(envs):
+            return None
+        slots = alive[envs].argmin(axis=1)
+        xs[envs, slots] = self.rng.integers(0, self.width, len(envs))
+        ys[envs, slots] = 0.0
+        alive[envs, slots] = True
+        return envs, slots
+
+    def _add_bullets(self, xs, ys, alive, fire, fx, fy):
+        # Scatter the bullets flagged in fire (n, k) into free slots; bullets
+        # that don't fit in a full slot table are dropped
+        envs, k = np.nonzero(fire)
+        if not len(envs):
+            return
+        rank = np.cumsum(fire, axis=1)[envs, k] - 1
+        free_order = np.argsort(alive[envs], axis=1, kind="stable")
+        n_free = (~alive[envs]).sum(axis=1)
+        ok = np.flatnonzero(rank < n_free)
+        slots = free_order[ok, rank[ok]]
+        envs, k = envs[ok], k[ok]
+        fx = np.broadcast_to(fx, fire.shape)
+        fy = np.broadcast_to(fy, fire.shape)
+        xs[envs, slots] = fx[envs, k]
+        ys[envs, slots] = fy[envs, k]
+        alive[envs, slots] = True
+
+    def observe(self):
+        # (n_envs, height, width) int8 grid of cell codes
+        n = self.n_envs
+        grid = np.zeros((n, self.cells), dtype=np.int8)
+        grid[self.body_mask()] = BODY
+        for alive, xs, ys, code in ((self.pu_alive, self.pu_x, self.pu_y, POWERUP),
+                                    (self.inv_alive, self.inv_x, self.inv_y, INVADER)):
+            r, slot = np.nonzero(alive)
+            grid[r, ys[r, slot].astype(np.int32) * self.width + xs[r, slot]] = code
+        for alive, xs, ys in ((self.up_alive, self.up_x, self.up_y),
+                              (self.down_alive, self.down_x, self.down_y)):
+            r, slot = np.nonzero(alive)
+            row = np.clip(ys[r, slot].astype(np.int32) // GRID_SIZE, 0, self.height - 1)
+            grid[r, row * self.width + xs[r, slot] // GRID_SIZE] = BULLET
+        has_berry = self.strawberry >= 0
+        grid[self._rows[has_berry], self.strawberry[has_berry]] = STRAWBERRY
+        grid[self._rows, self.head] = HEAD
+        return grid.reshape(n, self.height, self.width)
@@ -0,0 +1,292 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+from controllers import cycle_direction, steer
+from game_core import Direction, Action, GameState, NOOP, step
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Scripted stress scenarios, run headless. Every scenario is measured in
+# three modes: "sim" steps the simulation only (pygame is never imported),
+# "render" also draws each tick with GameRenderer and "dirty" with
+# DirtyRenderer, both on the SDL dummy video driver. Each run happens in a
+# fresh process so its peak memory is its own.
+
+MODES = ("sim", "render", "dirty")
+
+class Scenario:
+    # setup() prepares the game before timing starts (it may step it);
+    # action() gives the scripted input for every tick
+    description = ""
+    board = None  # (width, height) in cells, None for the default board
+    overlay = False  # Draw the F3 profiler overlay in the render modes
+
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+
+    def setup(self, state):
+        pass
+
+    def action(self, state):
+        return NOOP
+
+class LongSnake(Scenario):
+    description = "snake filling all but two rows of the board"
+
+    def target(self, state):
+        return state.width * (state.height - 2)
+
+    def setup(self, state):
+        state.max_invaders = 0
+        state.invader_spawn_rate = 0.0  # Also stops powerups
+        state.snake.activate_shield(10 ** 6)
+        target = self.target(state)
+        while state.snake.size < target:
+            step(state, self.action(state))
+
+    def action(self, state):
+        snake = state.snake
+        snake.growing = snake.size < self.target(state)  # Eating doesn't grow it any further
+        return steer(state, cycle_direction(state))
+
+class LargeArena(LongSnake):
+    description = "500x500 board, 20000-cell snake and 300 invaders, camera scrolling"
+    board = (500, 500)
+
+    def target(self, state):
+        return 20000
+
+    def setup(self, state):
+        LongSnake.setup(self, state)
+        state.max_invaders = 300
+        state.invader_spawn_rate = 1.0
+
+    def action(self, state):
+        snake = state.snake
+        if snake.shield_timer < 10 ** 6:
+            snake.activate_shield(10 ** 6)
+        return LongSnake.action(self, state)
+
+class FullBoard(LongSnake):
+    description = "longest snake the cycle allows; strawberry re-placed every tick"
+
+    def target(self, state):
+        return state.width * (state.height - 1) - 1
+
+    def action(self, state):
+        state.strawberry.randomize_position(state.free_cells)
+        return LongSnake.action(self, state)
+
+class InvaderSwarm(Scenario):
+    description = "up to 400 invaders spawning every frame, shielded snake turning at random"
+
+    def setup(self, state):
+        state.max_invaders = 400
+        state.invader_spawn_rate = 1.0
+        state.snake.activate_shield(10 ** 6)
+
+    def action(self, state):
+        snake = state.snake
+        if snake.shield_timer < 10 ** 6:  # Picking up a shield powerup shortened it
+            snake.activate_shield(10 ** 6)
+        if self.rng.random() < 0.1:
+            return Action(self.rng.choice(list(Direction)))
+        return NOOP
+
+class BulletStorm(InvaderSwarm):
+    description = "invader swarm with the snake shooting every tick, no cooldown"
+
+    def setup(self, state):
+        InvaderSwarm.setup(self, state)
+        state.max_invaders = 200
+        state.snake.activate_bullet_powerup(10 ** 6)
+        state.snake.shot_cooldown = 0
+
+    def action(self, state):
+        action = InvaderSwarm.action(self, state)
+        return Action(action.turns[0][0] if action.turns else None, shoot=True)
+
+class HudText(Scenario):
+    description = "score and level change every tick, all indicators and the F3 overlay shown"
+    overlay = True
+
+    def setup(self, state):
+        snake = state.snake
+        snake.activate_speed_boost(10 ** 6)
+        snake.activate_shield(10 ** 6)
+        snake.activate_bullet_powerup(10 ** 6)
+        state.max_invaders = 0
+
+    def action(self, state):
+        state.score += 1
+        state.level = state.score // 50 + 1
+        if self.rng.random() < 0.1:
+            return Action(self.rng.choice(list(Direction)))
+        return NOOP
+
+SCENARIOS = {
+    "long_snake": LongSnake,
+    "full_board": FullBoard,
+    "large_arena": LargeArena,
+    "invader_swarm": InvaderSwarm,
+    "bullet_storm": BulletStorm,
+    "hud_text": HudText,
+}
+
+def percentile(ordered, p):
+    return ordered[min(int(p / 100.0 * len(ordered)), len(ordered) - 1)]
+
+def peak_memory_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+def run(name, mode, ticks, seed):
+    # Runs in a child process; returns the result row for one scenario/mode
+    scenario = SCENARIOS[name](seed)
+    games = [0]
+
+    def new_game():
+        state = GameState(*(scenario.board or ()), seed=seed + games[0])
+        games[0] += 1
+        scenario.setup(state)
+        if profiler:
+            state.profiler = profiler
+        return state
+
+    profiler = None
+    if mode == "sim":
+        draw = None
+    else:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ["SDL_AUDIODRIVER"] = "dummy"
+        os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+        import pygame
+        from game_core import SCREEN_WIDTH, SCREEN_HEIGHT
+        from profiling import FrameProfiler
+        from render import GameRenderer, DirtyRenderer, ProfileOverlay
+
+        pygame.display.init()
+        pygame.font.init()
+        screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        renderer = DirtyRenderer(screen) if mode == "dirty" else GameRenderer(screen)
+        overlay = None
+        if scenario.overlay:
+            profiler = FrameProfiler()
+            overlay = ProfileOverlay(profiler)
+            renderer.profiler = profiler
+
+        def draw():
+            renderer.draw(state)
+            if overlay:
+                renderer.mark_dirty(overlay.draw(screen))
+            renderer.present()
+            if overlay:
+                profiler.end_frame()
+                profiler.begin_frame()
+
+    # A game that ends is replaced by a new one; setting it up isn't timed
+    state = new_game()
+    times = []
+    clock = time.perf_counter
+    for _ in range(ticks):
+        t = clock()
+        step(state, scenario.action(state))
+        if draw:
+            draw()
+        times.append(clock() - t)
+        if state.game_over:
+            state = new_game()
+    elapsed = sum(times)
+
+    times.sort()
+    return {
+        "scenario": name,
+        "mode": mode,
+        "ticks": len(times),
+        "ticks_per_s": len(times) / elapsed,
+        "p50_ms": percentile(times, 50) * 1000,
+        "p95_ms": percentile(times, 95) * 1000,
+        "p99_ms": percentile(times, 99) * 1000,
+        "max_ms": times[-1] * 1000,
+        "peak_mb": peak_memory_mb(),
+        "games": games[0],
+    }
+
+def run_isolated(name, mode, ticks, seed):
+    # Run in a new interpreter, which prints its result row as JSON
+    command = [sys.executable, os.path.abspath(__file__), "--child", name,
+               "--mode", mode, "--ticks", str(ticks), "--seed", str(seed)]
+    output = subprocess.run(command, stdout=subprocess.PIPE, check=True).stdout
+    return json.loads(output.decode().splitlines()[-1])
+
+def format_row(row, baseline=None):
+    peak = "-" if row["peak_mb"] is None else f"{row['peak_mb']:.1f}"
+    text = (f"{row['scenario']:<14}{row['mode']:<8}{row['ticks_per_s']:>10.0f}"
+            f"{row['p50_ms']:>9.3f}{row['p95_ms']:>9.3f}{row['p99_ms']:>9.3f}"
+            f"{row['max_ms']:>9.3f}{peak:>9}{row['games']:>7}")
+    if baseline:
+        old = baseline.get((row["scenario"], row["mode"]))
+        if old:
+            change = (row["ticks_per_s"] / old["ticks_per_s"] - 1) * 100
+            text += f"{change:>+9.1f}%"
+    return text
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cosmic Snake stress benchmarks")
+    parser.add_argument("scenarios", nargs="*", metavar="SCENARIO",
+                        help=f"any of {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("--mode", action="append", choices=MODES,
+                        help="sim, render or dirty; repeatable (default: all)")
+    parser.add_argument("--ticks", type=int, default=3000, help="timed ticks per run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", metavar="FILE", help="write the results to FILE as a baseline")
+    parser.add_argument("--baseline", metavar="FILE",
+                        help="compare ticks/s against a baseline saved with --save")
+    parser.add_argument("--list", action="store_true", help="describe the scenarios and exit")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario {name!r}")
+    if args.list:
+        for name, scenario in SCENARIOS.items():
+            print(f"{name:<14}{scenario.description}")
+        return 0
+    if args.child:
+        print(json.dumps(run(args.scenarios[0], args.mode[0], args.ticks, args.seed)))
+        return 0
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {(row["scenario"], row["mode"]): row for row in json.load(f)["results"]}
+
+    print(f"{'scenario':<14}{'mode':<8}{'ticks/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'max ms':>9}{'peak MB':>9}{'games':>7}" + (f"{'vs base':>10}" if baseline else ""))
+    results = []
+    for name in args.scenarios or list(SCENARIOS):
+        for mode in args.mode or MODES:
+            row = run_isolated(name, mode, args.ticks, args.seed)
+            results.append(row)
+            print(format_row(row, baseline), flush=True)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"ticks": args.ticks, "seed": args.seed, "python": sys.version.split()[0],
+                       "platform": sys.platform, "results": results}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
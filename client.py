@@ -0,0 +1,153 @@
+import argparse
+import asyncio
+import random
+import socket
+import sys
+import time
+
+from game_core import Direction, Action
+from netcode import (HELLO, HELLO_BODY, INPUT, SNAPSHOT, SNAPSHOT_HEADER, WELCOME, WELCOME_BODY,
+                     ALIVE, CONNECTED, GAME_OVER, FrameReader, Mirror, encode_input, frame,
+                     read_frame)
+from server import DEFAULT_PORT
+
+# Thin client for server.py: sends the player's input and draws the game
+# from the server's snapshots with the ordinary renderer; it doesn't
+# simulate anything itself. --bots N instead opens N headless connections
+# that steer at random, to load-test a server.
+
+def connect(host, port, room):
+    sock = socket.create_connection((host, port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.sendall(frame(HELLO, HELLO_BODY.pack(room)))
+    reader = FrameReader()
+    while True:
+        data = sock.recv(65536)
+        if not data:
+            raise ConnectionError("server closed the connection")
+        frames = reader.feed(data)
+        if frames:
+            break
+    kind, payload = frames.pop(0)
+    if kind != WELCOME:
+        raise ConnectionError(f"unexpected message {kind} from the server")
+    sock.setblocking(False)
+    return sock, reader, WELCOME_BODY.unpack(payload), frames
+
+def play(host, port, room):
+    import pygame
+    from cosmic_snake import KEY_DIRECTIONS, init_display
+    from game_core import SCREEN_WIDTH
+    from render import GameRenderer, GREEN, RED, WHITE, draw_text
+
+    sock, reader, welcome, pending = connect(host, port, room)
+    index, room_id, seed, width, height, room_size = welcome
+    mirror = Mirror(seed, width, height, index)
+    screen, clock = init_display()
+    pygame.display.set_caption(f"Cosmic Snake - room {room_id}, player {index + 1}")
+    renderer = GameRenderer(screen)
+    action = Action()
+    ack = None  # Tick of the newest snapshot applied and not yet acknowledged
+
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_q
+                                             and mirror.state.game_over):
+                sock.close()
+                pygame.quit()
+                return 0
+            if event.type == pygame.KEYDOWN:
+                if event.key in KEY_DIRECTIONS:
+                    action.turn(KEY_DIRECTIONS[event.key])
+                elif event.key == pygame.K_SPACE:
+                    action.shoot = True
+
+        try:
+            data = sock.recv(1 << 20)
+            if not data:
+                print("Disconnected")
+                return 1
+            pending.extend(reader.feed(data))
+        except BlockingIOError:
+            pass
+        for kind, payload in pending:
+            if kind == SNAPSHOT:
+                ack = mirror.apply(payload)
+        pending.clear()
+
+        if ack is not None or action.turns or action.shoot:
+            sock.sendall(frame(INPUT, encode_input(ack or 0, action)))
+            action = Action()
+            ack = None
+
+        renderer.draw(mirror.state)
+        for i, (score, status) in enumerate(mirror.scoreboard):
+            color = GREEN if i == index else WHITE if status & ALIVE else RED
+            label = f"P{i + 1} {score}" + ("" if status & CONNECTED else " (left)")
+            draw_text(screen, label, 18, SCREEN_WIDTH - 70, 40 + 20 * i, color)
+        if mirror.state.game_over:
+            draw_text(screen, "GAME OVER - Q to quit", 36, SCREEN_WIDTH // 2, 260, RED)
+        renderer.present()
+        clock.tick(60)
+
+async def bot(host, port, rng, stats):
+    # One headless player: acknowledges every snapshot, turns at random,
+    # and joins another room once its snake is out
+    while True:
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(frame(HELLO, HELLO_BODY.pack(-1)))
+        try:
+            kind, payload = await read_frame(reader)
+            while True:
+                kind, payload = await read_frame(reader)
+                stats[0] += 1
+                stats[1] += len(payload) + 5
+                if kind != SNAPSHOT:
+                    continue
+                header = SNAPSHOT_HEADER.unpack_from(payload)
+                tick, flags = header[0], header[2]
+                if flags & GAME_OVER:
+                    break
+                action = Action(rng.choice(list(Direction)) if rng.random() < 0.2 else None)
+                writer.write(frame(INPUT, encode_input(tick, action)))
+        finally:
+            writer.close()
+
+async def run_bots(host, port, count, seed):
+    stats = [0, 0]  # Snapshots and bytes received
+    tasks = []
+    for i in range(count):
+        tasks.append(asyncio.ensure_future(bot(host, port, random.Random(seed + i), stats)))
+        await asyncio.sleep(0.01)  # Don't join everyone in the same tick
+    start = time.perf_counter()
+    while True:
+        await asyncio.sleep(5.0)
+        for task in tasks:
+            if task.done():
+                task.result()  # Raise a bot's error here
+        elapsed = time.perf_counter() - start
+        print(f"{count} bots: {stats[0] / elapsed:.0f} snapshots/s, "
+              f"{stats[1] / elapsed / 1024:.1f} KiB/s", flush=True)
+        stats[0] = stats[1] = 0
+        start = time.perf_counter()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cosmic Snake multiplayer client")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--room", type=int, default=-1, help="room to join (default: any with space)")
+    parser.add_argument("--bots", type=int, metavar="N",
+                        help="instead of playing, connect N random headless players (load test)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the bots' moves")
+    args = parser.parse_args(argv)
+
+    if args.bots:
+        try:
+            asyncio.run(run_bots(args.host, args.port, args.bots, args.seed))
+        except KeyboardInterrupt:
+            pass
+        return 0
+    return play(args.host, args.port, args.room)
+
+if __name__ == "__main__":
+    sys.exit(main())
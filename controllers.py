@@ -0,0 +1,326 @@
+import importlib
+import random
+from array import array
+from collections import deque
+from functools import partial
+from time import perf_counter
+
+from game_core import GRID_SIZE, Direction, Action, NOOP
+
+# Controllers play the game instead of the keyboard. A controller is any
+# callable that takes the GameState before a tick and returns the Action
+# for that tick. CONTROLLERS maps names to factories that take a seed, so
+# every game of a tournament can get its own reproducible controller.
+
+def cycle_direction(state):
+    # Next move along a cycle through every cell of the wrapping board:
+    # right along a row, then down one. A snake up to width * (height - 1)
+    # long can follow it forever without touching itself.
+    snake = state.snake
+    if snake.moves % state.width == state.width - 1:
+        return Direction.DOWN
+    return Direction.RIGHT
+
+def steer(state, direction):
+    # Action turning the snake towards direction, or NOOP if it already is
+    snake = state.snake
+    last = snake.turns[-1][0] if snake.turns else snake.direction
+    return Action(direction) if direction != last else NOOP
+
+class IdleController:
+    # Never touches the controls
+    def __init__(self, seed=None):
+        pass
+
+    def __call__(self, state):
+        return NOOP
+
+class RandomController:
+    # Turns and shoots at random
+    def __init__(self, seed=None, turn_chance=0.1, shoot_chance=0.3):
+        self.rng = random.Random(f"controller-{seed}")
+        self.turn_chance = turn_chance
+        self.shoot_chance = shoot_chance
+        self.directions = list(Direction)
+
+    def __call__(self, state):
+        rng = self.rng
+        direction = rng.choice(self.directions) if rng.random() < self.turn_chance else None
+        shoot = rng.random() < self.shoot_chance
+        if direction is None and not shoot:
+            return NOOP
+        return Action(direction, shoot)
+
+class CycleController:
+    # Scripted: follows cycle_direction and shoots whenever it can
+    def __init__(self, seed=None):
+        pass
+
+    def __call__(self, state):
+        action = steer(state, cycle_direction(state))
+        if state.snake.can_shoot:
+            action = Action(action.turns[0][0] if action.turns else None, shoot=True)
+        return action
+
+AUTOPILOT_BUDGET = 0.001  # Seconds of path search per tick
+AUTOPILOT_EXPANSIONS = 2000  # Cells of path search per tick for the "autopilot" controller
+AUTOPILOT_REFRESH = 8  # Moves between rebuilds of the distance field
+INVADER_DANGER_ROWS = 2  # Rows below an invader the path search avoids
+BULLET_DANGER_ROWS = 3  # Rows below a downward bullet the path search avoids
+
+class AutopilotController:
+    # Steers towards the strawberry and powerups, away from its own body,
+    # invaders and their bullets, and shoots invaders above the head.
+    #
+    # Paths come from a distance field: a breadth-first search outwards
+    # from the goals over the wrapping board, so each cell it reaches knows
+    # its distance to the nearest goal and the snake moves to the
+    # neighbour with the smallest one. The field doesn't depend on where
+    # the head is, so it stays usable as the snake moves and is only
+    # rebuilt when the goals change or, as obstacles drift, every
+    # `refresh` moves. A rebuild is spread over as many ticks as it needs:
+    # each call expands the search for at most `budget` seconds (and/or
+    # `expansions` cells), and the previous field is used until the new
+    # one is complete. Neighbours the search hasn't reached yet are ranked
+    # by straight-line distance to the strawberry instead.
+    #
+    # With budget=None the moves don't depend on the machine's speed,
+    # which tournaments and soak tests comparing runs may want.
+    def __init__(self, seed=None, budget=AUTOPILOT_BUDGET, expansions=None,
+                 refresh=AUTOPILOT_REFRESH, trap_check=64):
+        self.budget = budget
+        self.expansions = expansions
+        self.refresh = refresh
+        self.trap_check = trap_check  # Cells of room a move must leave the snake
+        self.state = None
+
+    def reset(self, state):
+        self.state = state
+        size = state.width * state.height
+        self.fields = (DistanceField(size), DistanceField(size))
+        self.field = self.fields[0]  # Moves from each cell to the nearest goal
+        self.building = None  # Field being built, None when up to date
+        self.frontier = deque()
+        self.avoid = set()  # Cells the field being built goes around
+        self.goals = None
+        self.built_at = 0  # snake.moves when the last rebuild started
+
+    def __call__(self, state):
+        if state is not self.state:
+            self.reset(state)
+        snake = state.snake
+        deadline = None if self.budget is None else perf_counter() + self.budget
+
+        goals = (state.strawberry.position, len(state.powerups))
+        if goals != self.goals:
+            # The old field leads to the wrong place; use the new one as it grows
+            self.start_build(state, goals, self.field)
+        elif self.building is None and snake.moves - self.built_at >= self.refresh:
+            spare = self.fields[self.field is self.fields[0]]
+            self.start_build(state, goals, spare)
+
+        # Turns only matter on ticks where the snake moves
+        direction = None
+        if state.snake_wait <= 1 and not snake.turns:
+            direction = self.choose(state)
+        shoot = snake.can_shoot and self.invader_above(state)
+
+        if self.building is not None:
+            self.expand(deadline)
+        if direction is None and not shoot:
+            return NOOP
+        return Action(direction, shoot)
+
+    def start_build(self, state, goals, field):
+        self.goals = goals
+        self.built_at = state.snake.moves
+        # Only threats the snake can reach before the next rebuild matter
+        self.avoid = danger_cells(state, INVADER_DANGER_ROWS, BULLET_DANGER_ROWS, self.refresh + 2)
+        width = state.width
+        size = width * state.height
+        sources = []
+        if state.strawberry.position is not None:
+            x, y = state.strawberry.position
+            sources.append(y * width + x)
+        for powerup in state.powerups:
+            # It falls into the cell below before long
+            sources.append(powerup.cell)
+            if powerup.cell + width < size:
+                sources.append(powerup.cell + width)
+        field.clear()
+        for cell in sources:
+            field.set(cell, 0)
+        self.building = field
+        self.frontier = deque(sources)
+
+    def expand(self, deadline):
+        # Continue the search until the deadline or expansion limit
+        state = self.state
+        width = state.width
+        size = width * state.height
+        occupancy = state.snake.occupancy
+        avoid = self.avoid
+        field = self.building
+        distances = field.distances
+        stamps = field.stamps
+        search = field.search
+        frontier = self.frontier
+        limit = self.expansions
+        expanded = 0
+        while frontier:
+            cell = frontier.popleft()
+            distance = distances[cell] + 1
+            x = cell % width
+            row = cell - x
+            for neighbour in (row + (x + 1) % width, row + (x - 1) % width,
+                              (cell + width) % size, (cell - width) % size):
+                if stamps[neighbour] != search and not occupancy[neighbour] and neighbour not in avoid:
+                    stamps[neighbour] = search
+                    distances[neighbour] = distance
+                    frontier.append(neighbour)
+            expanded += 1
+            if limit is not None and expanded >= limit:
+                break
+            if deadline is not None and expanded & 31 == 0 and perf_counter() >= deadline:
+                break
+        if not frontier:
+            self.field = field
+            self.building = None
+
+    def choose(self, state):
+        # Direction for the next move, or None to keep going
+        snake = state.snake
+        width = state.width
+        height = state.height
+        hx, hy = snake.get_head_position()
+        sdx, sdy = snake.direction.value
+        occupancy = snake.occupancy
+        tail = -1 if snake.growing else snake.tail_cell()  # Moves away as the head moves
+        shielded = snake.shield_active and snake.shield_timer > 2 * snake.move_interval()
+        threats = set() if shielded else danger_cells(state, 1, 1, 1)
+        room_needed = min(self.trap_check, snake.size)
+        target = state.strawberry.position
+        best = None
+        for direction in Direction:
+            dx, dy = direction.value
+            if snake.size > 1 and dx == -sdx and dy == -sdy:
+                continue
+            x = (hx + dx) % width
+            y = (hy + dy) % height
+            cell = y * width + x
+            if occupancy[cell] and cell != tail:
+                continue
+            distance = self.field.get(cell)
+            if distance is None:
+                distance = width + height  # Behind anything the field has reached
+                if target is not None:
+                    distance += wrap_distance(x, y, target[0], target[1], width, height)
+            trapped = self.room(state, cell, room_needed) < room_needed
+            score = (cell in threats, trapped, distance)
+            if best is None or score < best[0]:
+                best = (score, direction)
+        if best is None or best[1] == snake.direction:
+            return None
+        return best[1]
+
+    def room(self, state, start, limit):
+        # Free cells reachable from start, counting up to limit
+        width = state.width
+        size = width * state.height
+        occupancy = state.snake.occupancy
+        seen = {start}
+        stack = [start]
+        while stack and len(seen) < limit:
+            cell = stack.pop()
+            x = cell % width
+            row = cell - x
+            for neighbour in (row + (x + 1) % width, row + (x - 1) % width,
+                              (cell + width) % size, (cell - width) % size):
+                if neighbour not in seen and not occupancy[neighbour]:
+                    seen.add(neighbour)
+                    stack.append(neighbour)
+        return len(seen)
+
+    def invader_above(self, state):
+        hx, hy = state.snake.get_head_position()
+        for invader in state.invaders:
+            if invader.grid_x == hx and invader.grid_y < hy:
+                return True
+        return False
+
+class DistanceField:
+    # Search results in arrays that are reused from one search to the next.
+    # An entry only counts if its stamp is the current search number, so
+    # starting a search costs nothing however big the board is.
+    def __init__(self, size):
+        self.distances = array("i", bytes(4 * size))
+        self.stamps = array("i", bytes(4 * size))
+        self.search = 0
+
+    def clear(self):
+        self.search += 1
+
+    def set(self, cell, distance):
+        self.stamps[cell] = self.search
+        self.distances[cell] = distance
+
+    def get(self, cell):
+        return self.distances[cell] if self.stamps[cell] == self.search else None
+
+def danger_cells(state, invader_rows, bullet_rows, radius):
+    # Cells invaders and downward bullets cover now or will fall into
+    # within the given number of rows, for those within radius cells of
+    # the head (further away they will have moved before the snake arrives)
+    width = state.width
+    height = state.height
+    hx, hy = state.snake.get_head_position()
+    cells = set()
+    for invader in state.invaders:
+        dx = abs(invader.grid_x - hx)
+        dy = abs(int(invader.grid_y) - hy)
+        if min(dx, width - dx) > radius or min(dy, height - dy) > radius + invader_rows:
+            continue
+        row = int(invader.grid_y)
+        for y in range(row, min(row + invader_rows + 1, height)):
+            cells.add(y * width + invader.grid_x)
+    half = GRID_SIZE // 2
+    for bullet in state.bullets:
+        if bullet.direction < 0:
+            continue
+        x = bullet.x // GRID_SIZE
+        dx = abs(x - hx)
+        if min(dx, width - dx) > radius:
+            continue
+        top = max(int(bullet.y) - bullet.height // 2, 0) // GRID_SIZE
+        dy = abs(top - hy)
+        if min(dy, height - dy) > radius + bullet_rows:
+            continue
+        bottom = (int(bullet.y) + bullet.height // 2 + half) // GRID_SIZE + bullet_rows
+        for y in range(top, min(bottom, height)):
+            cells.add(y * width + x)
+    return cells
+
+def wrap_distance(x1, y1, x2, y2, width, height):
+    dx = abs(x1 - x2)
+    dy = abs(y1 - y2)
+    return min(dx, width - dx) + min(dy, height - dy)
+
+CONTROLLERS = {
+    "idle": IdleController,
+    "random": RandomController,
+    "cycle": CycleController,
+    # Limited by cells, not time, so tournaments repeat on any machine and
+    # any number of workers
+    "autopilot": partial(AutopilotController, budget=None, expansions=AUTOPILOT_EXPANSIONS),
+}
+
+def load_controller(spec):
+    # Controller factory from a name in CONTROLLERS or "module:attribute",
+    # where the attribute is called with the game's seed
+    if spec in CONTROLLERS:
+        return CONTROLLERS[spec]
+    module_name, sep, attribute = spec.partition(":")
+    if not sep:
+        raise ValueError(f"unknown controller {spec!r}; use one of {', '.join(CONTROLLERS)} "
+                         "or module:factory")
+    return getattr(importlib.import_module(module_name), attribute)
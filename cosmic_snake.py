@@ -1,347 +1,84 @@
-import pygame
-import random
-import sys
-import os
 import time
-from enum import Enum
-
-# Initialize pygame
-pygame.init()
-
-# Constants
-SCREEN_WIDTH = 800
-SCREEN_HEIGHT = 600
-GRID_SIZE = 20
-GRID_WIDTH = SCREEN_WIDTH // GRID_SIZE
-GRID_HEIGHT = SCREEN_HEIGHT // GRID_SIZE
-SNAKE_SPEED = 10  # Base speed
-INVADER_SPEED = 1.5
-INVADER_SPAWN_RATE = 0.02  # Probability of spawning an invader per frame
-MAX_INVADERS = 10
-INVADER_FIRE_RATE = 0.005  # Probability of an invader firing per frame
-
-# Colors
-WHITE = (255, 255, 255)
-BLACK = (0, 0, 0)
-GREEN = (0, 255, 0)
-RED = (255, 0, 0)
-BLUE = (0, 0, 255)
-YELLOW = (255, 255, 0)
-PURPLE = (128, 0, 128)
-
-# Create the screen
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Cosmic Snake")
-clock = pygame.time.Clock()
 
-# Load images (we'll use placeholder rectangles for now, but you can add real images)
-def load_image(name, size=(GRID_SIZE, GRID_SIZE)):
-    try:
-        image = pygame.Surface(size)
-        if name == "snake_head":
-            image.fill(GREEN)
-        elif name == "snake_body":
-            image.fill((0, 200, 0))
-        elif name == "strawberry":
-            image.fill(RED)
-        elif name == "invader":
-            image.fill(PURPLE)
-        elif name == "bullet":
-            image.fill(YELLOW)
-        elif name == "speed_powerup":
-            image.fill(BLUE)
-        elif name == "shield_powerup":
-            image.fill((0, 255, 255))
-        elif name == "bullet_powerup":
-            image.fill((255, 165, 0))
-        return image
-    except pygame.error as e:
-        print(f"Couldn't load image: {e}")
-        return pygame.Surface(size)
+STARTED = time.perf_counter()  # Before the other imports, for --startup-trace
 
-# Direction enum
-class Direction(Enum):
-    UP = (0, -1)
-    DOWN = (0, 1)
-    LEFT = (-1, 0)
-    RIGHT = (1, 0)
-
-# PowerUp types
-class PowerUpType(Enum):
-    SPEED = 0
-    SHIELD = 1
-    BULLET = 2
+import argparse
+import atexit
+import os
+import pygame
+import sys
+from functools import partial
 
-# Game object classes
-class Snake:
-    def __init__(self):
-        self.reset()
-        self.head_image = load_image("snake_head")
-        self.body_image = load_image("snake_body")
-        
-    def reset(self):
-        self.length = 3
-        self.positions = [(GRID_WIDTH // 2, GRID_HEIGHT // 2)]
-        self.direction = Direction.RIGHT
-        self.next_direction = Direction.RIGHT
-        self.growing = False
-        self.speed_boost = 0
-        self.shield_active = False
-        self.shield_timer = 0
-        self.can_shoot = False
-        self.bullet_timer = 0
-        self.last_shot_time = 0
-        self.shot_cooldown = 500  # milliseconds
-        
-    def get_head_position(self):
-        return self.positions[0]
-    
-    def change_direction(self, direction):
-        if len(self.positions) > 1:
-            # Prevent the snake from reversing
-            if ((direction == Direction.UP and self.direction != Direction.DOWN) or 
-                (direction == Direction.DOWN and self.direction != Direction.UP) or 
-                (direction == Direction.LEFT and self.direction != Direction.RIGHT) or 
-                (direction == Direction.RIGHT and self.direction != Direction.LEFT)):
-                self.next_direction = direction
-        else:
-            self.next_direction = direction
-    
-    def move(self):
-        head = self.get_head_position()
-        dx, dy = self.next_direction.value
-        new_x = (head[0] + dx) % GRID_WIDTH
-        new_y = (head[1] + dy) % GRID_HEIGHT
-        new_head = (new_x, new_y)
-        
-        # Check for collision with self
-        if new_head in self.positions[1:]:
-            return False
-            
-        self.positions.insert(0, new_head)
-        self.direction = self.next_direction
-        
-        if not self.growing:
-            self.positions.pop()
-        else:
-            self.growing = False
-            self.length += 1
-            
-        return True
-    
-    def grow(self):
-        self.growing = True
-    
-    def activate_speed_boost(self, duration=5):
-        self.speed_boost = duration * SNAKE_SPEED
-    
-    def activate_shield(self, duration=5):
-        self.shield_active = True
-        self.shield_timer = duration * SNAKE_SPEED
-    
-    def activate_bullet_powerup(self, duration=10):
-        self.can_shoot = True
-        self.bullet_timer = duration * SNAKE_SPEED
-    
-    def update_powerups(self):
-        if self.speed_boost > 0:
-            self.speed_boost -= 1
-            
-        if self.shield_active:
-            self.shield_timer -= 1
-            if self.shield_timer <= 0:
-                self.shield_active = False
-                
-        if self.can_shoot:
-            self.bullet_timer -= 1
-            if self.bullet_timer <= 0:
-                self.can_shoot = False
-    
-    def shoot(self):
-        if not self.can_shoot:
-            return None
-            
-        current_time = pygame.time.get_ticks()
-        if current_time - self.last_shot_time < self.shot_cooldown:
-            return None
-            
-        self.last_shot_time = current_time
-        head = self.get_head_position()
-        # Adjust bullet position to be centered at the head
-        bullet_pos = (head[0] * GRID_SIZE + GRID_SIZE // 2, head[1] * GRID_SIZE)
-        return Bullet(bullet_pos, -1)  # -1 for upward direction
-    
-    def draw(self, surface):
-        for i, p in enumerate(self.positions):
-            rect = pygame.Rect((p[0] * GRID_SIZE, p[1] * GRID_SIZE), (GRID_SIZE, GRID_SIZE))
-            
-            if i == 0:  # Head
-                surface.blit(self.head_image, rect)
-                # Draw eyes on the head
-                if self.direction == Direction.UP:
-                    pygame.draw.circle(surface, BLACK, (rect.x + GRID_SIZE // 3, rect.y + GRID_SIZE // 3), 2)
-                    pygame.draw.circle(surface, BLACK, (rect.x + 2 * GRID_SIZE // 3, rect.y + GRID_SIZE // 3), 2)
-                elif self.direction == Direction.DOWN:
-                    pygame.draw.circle(surface, BLACK, (rect.x + GRID_SIZE // 3, rect.y + 2 * GRID_SIZE // 3), 2)
-                    pygame.draw.circle(surface, BLACK, (rect.x + 2 * GRID_SIZE // 3, rect.y + 2 * GRID_SIZE // 3), 2)
-                elif self.direction == Direction.LEFT:
-                    pygame.draw.circle(surface, BLACK, (rect.x + GRID_SIZE // 3, rect.y + GRID_SIZE // 3), 2)
-                    pygame.draw.circle(surface, BLACK, (rect.x + GRID_SIZE // 3, rect.y + 2 * GRID_SIZE // 3), 2)
-                elif self.direction == Direction.RIGHT:
-                    pygame.draw.circle(surface, BLACK, (rect.x + 2 * GRID_SIZE // 3, rect.y + GRID_SIZE // 3), 2)
-                    pygame.draw.circle(surface, BLACK, (rect.x + 2 * GRID_SIZE // 3, rect.y + 2 * GRID_SIZE // 3), 2)
-            else:  # Body
-                surface.blit(self.body_image, rect)
-                
-        # Draw shield if active
-        if self.shield_active:
-            head = self.get_head_position()
-            shield_rect = pygame.Rect((head[0] * GRID_SIZE - 2, head[1] * GRID_SIZE - 2), 
-                                      (GRID_SIZE + 4, GRID_SIZE + 4))
-            pygame.draw.rect(surface, (0, 255, 255), shield_rect, 2)
+from assets import AssetCache
+from controllers import AutopilotController
+from eventlog import EventLog
+from game_core import (SCREEN_WIDTH, SCREEN_HEIGHT, GRID_WIDTH, GRID_HEIGHT, SIM_DT,
+                       Direction, Action, GameState, board_size, step)
+from profiling import FrameProfiler, Histogram, StartupTrace
+from replay import REPLAY_EXTENSION, ReplayWriter
+from savestate import restore_state, save_state
+from render import (BLACK, GREEN, RED, SPRITES, GameRenderer, DirtyRenderer, ProfileOverlay, draw_text,
+                    text_cache)
 
-class Strawberry:
-    def __init__(self):
-        self.position = (0, 0)
-        self.image = load_image("strawberry")
-        self.randomize_position()
-    
-    def randomize_position(self, snake_positions=None, invaders=None, powerups=None):
-        if snake_positions is None:
-            snake_positions = []
-        if invaders is None:
-            invaders = []
-        if powerups is None:
-            powerups = []
-            
-        invader_positions = [(inv.grid_x, inv.grid_y) for inv in invaders]
-        powerup_positions = [p.get_grid_position() for p in powerups]
-        
-        all_occupied = snake_positions + invader_positions + powerup_positions
-        
-        while True:
-            x = random.randint(0, GRID_WIDTH - 1)
-            y = random.randint(0, GRID_HEIGHT - 1)
-            if (x, y) not in all_occupied:
-                self.position = (x, y)
-                break
-    
-    def draw(self, surface):
-        rect = pygame.Rect((self.position[0] * GRID_SIZE, self.position[1] * GRID_SIZE), 
-                          (GRID_SIZE, GRID_SIZE))
-        surface.blit(self.image, rect)
+DISPLAY_FPS = 60
+MAX_FRAME_TIME = 0.25  # Seconds; longer stalls are dropped rather than simulated
+BACKGROUND_SLICE = 0.008  # Seconds of preloading per loop while a screen waits for a key
+UNFOCUSED_FPS = 10  # Frame rate cap while another window has the focus
+IDLE_POLL_MIN = 25  # Milliseconds slept before the first event check on screens waiting for a key
+IDLE_POLL_MAX = 400  # Longest sleep, reached by doubling, between later checks
 
-class Invader:
-    def __init__(self):
-        self.grid_x = random.randint(0, GRID_WIDTH - 1)
-        self.grid_y = 0  # Start at the top
-        self.image = load_image("invader")
-        self.speed = INVADER_SPEED
-        
-    def move(self):
-        self.grid_y += self.speed / SNAKE_SPEED
-        
-        # Check if the invader has reached the bottom
-        if int(self.grid_y) >= GRID_HEIGHT:
-            return False
-        return True
-        
-    def get_position(self):
-        return (int(self.grid_x), int(self.grid_y))
-    
-    def draw(self, surface):
-        rect = pygame.Rect((self.grid_x * GRID_SIZE, int(self.grid_y) * GRID_SIZE), 
-                          (GRID_SIZE, GRID_SIZE))
-        surface.blit(self.image, rect)
-        
-    def fire(self):
-        if random.random() < INVADER_FIRE_RATE:
-            bullet_pos = (self.grid_x * GRID_SIZE + GRID_SIZE // 2, 
-                         int(self.grid_y) * GRID_SIZE + GRID_SIZE)
-            return Bullet(bullet_pos, 1)  # 1 for downward direction
-        return None
+# Fonts made while the start screen waits: the end screen, the HUD and the F3 overlay
+FONT_SIZES = (64, 36, 24, 20, 18)
 
-class Bullet:
-    def __init__(self, position, direction):
-        self.x, self.y = position
-        self.direction = direction  # 1 for down (invader), -1 for up (snake)
-        self.speed = 5
-        self.width = 4
-        self.height = 10
-        self.image = load_image("bullet", (self.width, self.height))
-        
-    def move(self):
-        self.y += self.direction * self.speed
-        
-        # Check if bullet is off-screen
-        if self.y < 0 or self.y > SCREEN_HEIGHT:
-            return False
-        return True
-        
-    def draw(self, surface):
-        rect = pygame.Rect((self.x - self.width // 2, self.y - self.height // 2), 
-                          (self.width, self.height))
-        surface.blit(self.image, rect)
-        
-    def get_rect(self):
-        return pygame.Rect((self.x - self.width // 2, self.y - self.height // 2), 
-                          (self.width, self.height))
+# Phases of a frame in the order they run, for the profiler's reports
+FRAME_PHASES = ("events", "autopilot", "input", "snake", "spawn", "invaders", "powerups",
+                "bullets", "collide_invaders", "collide_powerups", "collide_bullets",
+                "draw", "hud", "overlay", "present", "idle", "other")
 
-class PowerUp:
-    def __init__(self, powerup_type):
-        self.type = powerup_type
-        self.grid_x = random.randint(0, GRID_WIDTH - 1)
-        self.grid_y = 0  # Start at the top
-        self.speed = INVADER_SPEED * 0.8  # Slightly slower than invaders
-        self.active_time = 10 * SNAKE_SPEED  # Active for 10 seconds
-        
-        if powerup_type == PowerUpType.SPEED:
-            self.image = load_image("speed_powerup")
-        elif powerup_type == PowerUpType.SHIELD:
-            self.image = load_image("shield_powerup")
-        else:  # PowerUpType.BULLET
-            self.image = load_image("bullet_powerup")
-            
-    def move(self):
-        self.grid_y += self.speed / SNAKE_SPEED
-        
-        # Check if the powerup has reached the bottom
-        if int(self.grid_y) >= GRID_HEIGHT:
-            return False
-        return True
-        
-    def get_grid_position(self):
-        return (int(self.grid_x), int(self.grid_y))
-    
-    def draw(self, surface):
-        rect = pygame.Rect((self.grid_x * GRID_SIZE, int(self.grid_y) * GRID_SIZE), 
-                          (GRID_SIZE, GRID_SIZE))
-        surface.blit(self.image, rect)
+KEY_DIRECTIONS = {
+    pygame.K_UP: Direction.UP,
+    pygame.K_DOWN: Direction.DOWN,
+    pygame.K_LEFT: Direction.LEFT,
+    pygame.K_RIGHT: Direction.RIGHT,
+}
 
-def draw_grid(surface):
-    for y in range(0, SCREEN_HEIGHT, GRID_SIZE):
-        for x in range(0, SCREEN_WIDTH, GRID_SIZE):
-            rect = pygame.Rect((x, y), (GRID_SIZE, GRID_SIZE))
-            pygame.draw.rect(surface, (40, 40, 40), rect, 1)
+def init_display(trace=None):
+    # Only the display: pygame.init() would also start audio and joysticks,
+    # and opening audio can stall for seconds on machines without a sound
+    # device. Fonts start on first use (see assets.TextCache).
+    pygame.display.init()
+    if trace:
+        trace.mark("display init")
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Cosmic Snake")
+    if trace:
+        trace.mark("window")
+    return screen, pygame.time.Clock()
 
-def draw_text(surface, text, size, x, y, color=WHITE):
-    font = pygame.font.SysFont(None, size)
-    text_surface = font.render(text, True, color)
-    text_rect = text_surface.get_rect()
-    text_rect.midtop = (x, y)
-    surface.blit(text_surface, text_rect)
+def idle_events():
+    # Events for a screen that only waits for a key, sleeping until there
+    # are some. pygame's event.wait() checks for events every millisecond;
+    # here the sleeps between checks start short, so a key pressed right
+    # away is handled promptly, and double up to IDLE_POLL_MAX, so a screen
+    # left alone wakes the CPU a few times a second. A window uncovered
+    # meanwhile is repainted from the display surface.
+    events = pygame.event.get()
+    delay = IDLE_POLL_MIN
+    while not events:
+        pygame.time.wait(delay)
+        delay = min(delay * 2, IDLE_POLL_MAX)
+        events = pygame.event.get()
+    if any(event.type in (pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED) for event in events):
+        pygame.display.flip()
+    return events
 
-def show_game_over_screen(surface, score):
-    surface.fill(BLACK)
-    draw_text(surface, "GAME OVER", 64, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 4, RED)
-    draw_text(surface, f"Score: {score}", 36, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
-    draw_text(surface, "Press SPACE to play again or Q to quit", 24, 
-              SCREEN_WIDTH // 2, SCREEN_HEIGHT * 3 // 4)
-    pygame.display.flip()
-    
+def wait_for_space(background=None):
+    # background is an iterator of small jobs to run while waiting, a
+    # slice of them per loop so keys are still handled promptly; once it
+    # is done the wait sleeps until the next event
     waiting = True
     while waiting:
-        for event in pygame.event.get():
+        for event in idle_events() if background is None else pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
@@ -351,233 +88,260 @@ def show_game_over_screen(surface, score):
                 elif event.key == pygame.K_q:
                     pygame.quit()
                     sys.exit()
-        clock.tick(10)
+        if background is not None:
+            deadline = time.perf_counter() + BACKGROUND_SLICE
+            for job in background:
+                job()
+                if time.perf_counter() >= deadline:
+                    break
+            else:
+                background = None
+
+def show_game_over_screen(surface, score):
+    surface.fill(BLACK)
+    draw_text(surface, "GAME OVER", 64, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 4, RED)
+    draw_text(surface, f"Score: {score}", 36, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
+    draw_text(surface, "Press SPACE to play again or Q to quit", 24,
+              SCREEN_WIDTH // 2, SCREEN_HEIGHT * 3 // 4)
+    pygame.display.flip()
+    wait_for_space()
 
-def show_start_screen(surface):
+def show_start_screen(surface, background=None, trace=None):
     surface.fill(BLACK)
     draw_text(surface, "COSMIC SNAKE", 64, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 4, GREEN)
-    draw_text(surface, "Arrow keys to move, SPACE to shoot", 24, 
+    draw_text(surface, "Arrow keys to move, SPACE to shoot", 24,
               SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
-    draw_text(surface, "Collect strawberries and avoid invaders", 22, 
+    draw_text(surface, "Collect strawberries and avoid invaders", 22,
               SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 30)
     draw_text(surface, "Press SPACE to start", 18, SCREEN_WIDTH // 2, SCREEN_HEIGHT * 3 // 4)
     pygame.display.flip()
-    
-    waiting = True
-    while waiting:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_SPACE:
-                    waiting = False
-                elif event.key == pygame.K_q:
-                    pygame.quit()
-                    sys.exit()
-        clock.tick(10)
+    if trace:
+        trace.mark("start screen")
+    wait_for_space(background)
 
-def main():
-    show_start_screen(screen)
-    
+def pause(surface):
+    # Wait for P; True if the window was closed instead
+    draw_text(surface, "PAUSED", 48, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
+    pygame.display.flip()
+    while True:
+        events = idle_events()
+        for i, pause_event in enumerate(events):
+            if pause_event.type == pygame.QUIT:
+                return True
+            elif pause_event.type == pygame.KEYDOWN:
+                if pause_event.key == pygame.K_p:
+                    # Whatever came in after the key is the game's to handle
+                    for event in events[i + 1:]:
+                        pygame.event.post(event)
+                    return False
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Cosmic Snake")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="only redraw and update the parts of the screen that changed")
+    parser.add_argument("--board", type=board_size, default=(GRID_WIDTH, GRID_HEIGHT),
+                        metavar="WxH", help=f"board size in cells (default: {GRID_WIDTH}x{GRID_HEIGHT}); "
+                                            "bigger boards scroll to follow the snake")
+    parser.add_argument("--fps", type=int, default=DISPLAY_FPS,
+                        help="frame rate cap for drawing (the game speed does not depend on it)")
+    parser.add_argument("--input-latency", action="store_true",
+                        help="print a histogram of key-to-screen latency for turns on exit")
+    parser.add_argument("--seed", type=int,
+                        help="seed for the first game (later games use seed+1, seed+2, ...)")
+    parser.add_argument("--record", metavar="DIR",
+                        help="save a replay of every game in DIR (see replay.py)")
+    parser.add_argument("--autopilot", action="store_true",
+                        help="let the computer play (attract mode); the arrow keys still steer")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="time every phase of every frame and write them to FILE on exit "
+                             "(JSON if it ends in .json, CSV otherwise); F3 shows the timings in game")
+    parser.add_argument("--log", metavar="DIR",
+                        help="log gameplay events and keep a leaderboard in DIR, written in the "
+                             "background (see eventlog.py)")
+    parser.add_argument("--startup-trace", action="store_true",
+                        help="print how long each stage of startup took, up to the first game frame")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    trace = StartupTrace(STARTED) if args.startup_trace else None
+    if trace:
+        trace.mark("imports")
+    screen, clock = init_display(trace)
+    # Time from reading a direction key to presenting the frame where the
+    # snake has turned
+    latency = Histogram()
+    if args.input_latency:
+        atexit.register(lambda: print(latency.report("Input latency")))
+    if args.record:
+        os.makedirs(args.record, exist_ok=True)
+    log = None
+    if args.log:
+        log = EventLog(args.log)
+        atexit.register(log.close)
+    # Per-phase frame timings: always on with --profile, otherwise only
+    # while the F3 overlay is shown
+    profiler = FrameProfiler(record=bool(args.profile), phases=FRAME_PHASES)
+    overlay = ProfileOverlay(profiler)
+    show_overlay = False
+    if args.profile:
+        def export_profile():
+            profiler.export(args.profile)
+            print(profiler.report())
+        atexit.register(export_profile)
+
+    # Sprites and fonts are made while the start screen waits for a key;
+    # whatever is left when it is pressed is finished before the first frame
+    assets = AssetCache()
+    preload = [partial(text_cache.font, size) for size in FONT_SIZES] + assets.preload_jobs(SPRITES)
+    if trace:
+        preload.append(partial(trace.mark, "preload"))
+    preload = iter(preload)
+    show_start_screen(screen, preload, trace)
+    if trace:
+        trace.mark("waiting for a key")
+    for job in preload:
+        job()
+    renderer = DirtyRenderer(screen, assets) if args.dirty_rects else GameRenderer(screen, assets)
+    if trace:
+        trace.mark("renderer")
+
+    games = 0
+    quicksave = None  # F5 saves the game in memory, F9 goes back to it
     while True:
         # Initialize game objects
-        snake = Snake()
-        strawberry = Strawberry()
-        invaders = []
-        bullets = []
-        powerups = []
-        
-        score = 0
-        level = 1
-        
-        # Difficulty increases with level
-        invader_spawn_rate = INVADER_SPAWN_RATE
-        invader_speed_multiplier = 1.0
-        
-        game_over = False
-        
-        # Main game loop
-        while not game_over:
-            clock.tick(SNAKE_SPEED + (snake.speed_boost > 0) * 5)
-            
+        state = GameState(*args.board, seed=None if args.seed is None else args.seed + games)
+        games += 1
+        recorder = None
+        if args.record:
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{state.seed}{REPLAY_EXTENSION}"
+            recorder = ReplayWriter(os.path.join(args.record, name), state)
+        autopilot = AutopilotController(state.seed) if args.autopilot else None
+        game = log.game_started(state, autopilot=args.autopilot) if log else None
+        action = Action()
+        accumulator = 0.0
+        previous = time.perf_counter()
+        applied = []  # Stamps of turns applied since the last present
+        focused = True  # Until the window says otherwise; unfocused frames are capped
+
+        # Main game loop: the simulation advances in fixed SIM_DT ticks to
+        # catch up with real time, and each displayed frame is drawn
+        # interpolated between the last two ticks
+        while not state.game_over:
+            now = time.perf_counter()
+            accumulator += min(now - previous, MAX_FRAME_TIME)
+            previous = now
+            active = profiler if args.profile or show_overlay else None
+            state.profiler = renderer.profiler = active
+            if active:
+                active.begin_frame()
+
             # Handle events
+            paused = False
+            quitting = False
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
+                    quitting = True
+                    break
+                elif event.type == pygame.WINDOWMINIMIZED:
+                    paused = True  # Nobody can see or steer it
+                elif event.type == pygame.WINDOWFOCUSLOST:
+                    focused = False
+                elif event.type == pygame.WINDOWFOCUSGAINED:
+                    focused = True
                 elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_UP:
-                        snake.change_direction(Direction.UP)
-                    elif event.key == pygame.K_DOWN:
-                        snake.change_direction(Direction.DOWN)
-                    elif event.key == pygame.K_LEFT:
-                        snake.change_direction(Direction.LEFT)
-                    elif event.key == pygame.K_RIGHT:
-                        snake.change_direction(Direction.RIGHT)
+                    if event.key in KEY_DIRECTIONS:
+                        action.turn(KEY_DIRECTIONS[event.key], time.perf_counter())
                     elif event.key == pygame.K_SPACE:
-                        bullet = snake.shoot()
-                        if bullet:
-                            bullets.append(bullet)
+                        action.shoot = True
                     elif event.key == pygame.K_p:
-                        # Pause functionality
-                        draw_text(screen, "PAUSED", 48, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
-                        pygame.display.flip()
                         paused = True
-                        while paused:
-                            for pause_event in pygame.event.get():
-                                if pause_event.type == pygame.QUIT:
-                                    pygame.quit()
-                                    sys.exit()
-                                elif pause_event.type == pygame.KEYDOWN:
-                                    if pause_event.key == pygame.K_p:
-                                        paused = False
-                            clock.tick(5)
-            
-            # Move snake
-            if not snake.move():
-                if not snake.shield_active:  # Shield protects from self-collision
-                    game_over = True
-                    continue
-                    
-            # Update powerups
-            snake.update_powerups()
-                
-            # Check if snake eats the strawberry
-            if snake.get_head_position() == strawberry.position:
-                snake.grow()
-                score += 10
-                strawberry.randomize_position(snake.positions, invaders, powerups)
-                
-                # Level up after every 5 strawberries
-                if score % 50 == 0:
-                    level += 1
-                    invader_spawn_rate += 0.01
-                    invader_speed_multiplier += 0.2
-            
-            # Spawn invaders
-            if len(invaders) < MAX_INVADERS and random.random() < invader_spawn_rate:
-                invaders.append(Invader())
-                
-            # Spawn powerups (10% chance every time an invader is added)
-            if random.random() < 0.1 and random.random() < invader_spawn_rate:
-                powerup_type = random.choice(list(PowerUpType))
-                powerups.append(PowerUp(powerup_type))
-            
-            # Move invaders and handle collisions
-            for invader in invaders[:]:
-                if not invader.move():
-                    invaders.remove(invader)
-                    continue
-                    
-                # Check if invader hits the snake
-                if invader.get_position() == snake.get_head_position():
-                    if snake.shield_active:
-                        invaders.remove(invader)
-                        score += 5
-                    else:
-                        game_over = True
-                        break
-                
-                # Invaders can fire bullets
-                bullet = invader.fire()
-                if bullet:
-                    bullets.append(bullet)
-            
-            # Move powerups and handle collisions
-            for powerup in powerups[:]:
-                if not powerup.move():
-                    powerups.remove(powerup)
-                    continue
-                    
-                # Check if snake collects powerup
-                if powerup.get_grid_position() == snake.get_head_position():
-                    if powerup.type == PowerUpType.SPEED:
-                        snake.activate_speed_boost()
-                    elif powerup.type == PowerUpType.SHIELD:
-                        snake.activate_shield()
-                    elif powerup.type == PowerUpType.BULLET:
-                        snake.activate_bullet_powerup()
-                    
-                    powerups.remove(powerup)
-                    score += 15
-            
-            # Move bullets and handle collisions
-            for bullet in bullets[:]:
-                if not bullet.move():
-                    bullets.remove(bullet)
-                    continue
-                    
-                bullet_rect = bullet.get_rect()
-                
-                # Check if bullet hits an invader (only snake bullets, which go up)
-                if bullet.direction < 0:
-                    for invader in invaders[:]:
-                        invader_rect = pygame.Rect(
-                            invader.grid_x * GRID_SIZE, 
-                            int(invader.grid_y) * GRID_SIZE,
-                            GRID_SIZE, GRID_SIZE
-                        )
-                        
-                        if bullet_rect.colliderect(invader_rect):
-                            bullets.remove(bullet)
-                            invaders.remove(invader)
-                            score += 20
-                            break
-                            
-                # Check if bullet hits the snake (only invader bullets, which go down)
-                elif bullet.direction > 0:
-                    for i, pos in enumerate(snake.positions):
-                        snake_rect = pygame.Rect(
-                            pos[0] * GRID_SIZE, 
-                            pos[1] * GRID_SIZE,
-                            GRID_SIZE, GRID_SIZE
-                        )
-                        
-                        if bullet_rect.colliderect(snake_rect):
-                            if i == 0 and snake.shield_active:
-                                # Shield protects the head from bullets
-                                bullets.remove(bullet)
-                                break
-                            else:
-                                game_over = True
-                                break
-            
+                    elif event.key == pygame.K_F3:
+                        show_overlay = not show_overlay
+                        renderer.invalidate()
+                    elif event.key == pygame.K_F5:
+                        quicksave = save_state(state)
+                    elif event.key == pygame.K_F9 and quicksave is not None:
+                        restore_state(quicksave, state)
+                        renderer.invalidate()
+                        action = Action()
+                        if recorder:
+                            # The inputs no longer lead to this state; keep what was recorded
+                            recorder.close()
+                            recorder = None
+            if paused and not quitting:
+                quitting = pause(screen)
+                renderer.invalidate()
+                focused = True  # Unpausing took a key press in this window
+                previous = time.perf_counter()
+                if active:
+                    active.begin_frame()  # Don't count the pause
+            if quitting:
+                if recorder:
+                    recorder.finish(state)
+                if log:
+                    log.game_ended(game, state)
+                pygame.quit()
+                sys.exit()
+            if active:
+                active.lap("events")
+
+            while accumulator >= SIM_DT and not state.game_over:
+                if autopilot:
+                    # Called every tick so its search keeps up, but keys win
+                    steering = autopilot(state)
+                    if not action.turns:
+                        action.turns = list(steering.turns)
+                    action.shoot = action.shoot or steering.shoot
+                    if active:
+                        active.lap("autopilot")
+                if recorder:
+                    recorder.record(action)
+                events = step(state, action)
+                if log and events:
+                    log.record(game, state.tick, events)
+                action = Action()
+                if state.snake.turn_stamp is not None:
+                    applied.append(state.snake.turn_stamp)
+                    state.snake.turn_stamp = None
+                accumulator -= SIM_DT
+            if state.game_over:
+                continue
+
             # Draw everything
-            screen.fill(BLACK)
-            # draw_grid(screen)  # Optional, for debugging
-            
-            strawberry.draw(screen)
-            
-            for invader in invaders:
-                invader.draw(screen)
-                
-            for powerup in powerups:
-                powerup.draw(screen)
-                
-            for bullet in bullets:
-                bullet.draw(screen)
-                
-            snake.draw(screen)
-            
-            # Draw UI
-            draw_text(screen, f"Score: {score}", 24, 100, 10)
-            draw_text(screen, f"Level: {level}", 24, SCREEN_WIDTH - 100, 10)
-            
-            # Draw powerup indicators
-            if snake.speed_boost > 0:
-                draw_text(screen, "SPEED!", 20, SCREEN_WIDTH // 2 - 100, 10, BLUE)
-                
-            if snake.shield_active:
-                draw_text(screen, "SHIELD!", 20, SCREEN_WIDTH // 2, 10, (0, 255, 255))
-                
-            if snake.can_shoot:
-                draw_text(screen, "BULLETS!", 20, SCREEN_WIDTH // 2 + 100, 10, YELLOW)
-            
-            pygame.display.flip()
-        
+            renderer.draw(state, accumulator / SIM_DT)
+            if show_overlay:
+                renderer.mark_dirty(overlay.draw(screen))
+            if active:
+                active.lap("overlay")
+            renderer.present()
+            if active:
+                active.lap("present")
+            if trace:
+                trace.mark("first game frame")
+                print(trace.report())
+                trace = None
+            if applied:
+                presented = time.perf_counter()
+                for stamp in applied:
+                    latency.record(presented - stamp)
+                applied.clear()
+            clock.tick(args.fps if focused else min(args.fps, UNFOCUSED_FPS))
+            if active:
+                active.lap("idle")
+                active.count("invaders", len(state.invaders))
+                active.count("powerups", len(state.powerups))
+                active.count("bullets", len(state.bullets))
+                active.count("snake", state.snake.size)
+                active.end_frame()
+
         # Game over - show the final screen
-        show_game_over_screen(screen, score)
+        if recorder:
+            recorder.finish(state)
+        if log:
+            log.game_ended(game, state)
+        show_game_over_screen(screen, state.score)
+        renderer.invalidate()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
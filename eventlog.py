@@ -0,0 +1,248 @@
+import argparse
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+from game_core import SIM_RATE, GameEvent
+
+# Gameplay event log. The game thread hands what step() returns to an
+# EventLog, which only appends it to a deque: append and popleft are
+# atomic, so the game never takes a lock or waits on the disk. A
+# background thread wakes every `interval` seconds, turns what has queued
+# up into JSON lines and appends them to the current log file as one gzip
+# member (the files read back as a single gzip stream). A file is rotated
+# once it passes `max_bytes`. One record per line:
+#   game_start  seed, board, plus whatever the game passed in
+#   strawberry, invader_shot, invader_shielded, bullet_blocked  cell
+#   powerup     powerup type
+#   level_up    level
+#   death       cause
+#   game_end    score, level, ticks, seconds, death ("quit" if the
+#               window was closed) and the counts of the events above
+#   dropped     events lost because the writer fell behind
+# Every record has "time" (Unix time), "session", "game" (numbered from 1
+# per session), "tick" and "event". Each game_end also updates the
+# leaderboard index in the log directory, which can be rebuilt from the
+# logs with `python eventlog.py DIR --rebuild`.
+
+LOG_PREFIX = "events-"
+LOG_EXTENSION = ".jsonl.gz"
+LEADERBOARD = "leaderboard.json"
+LEADERBOARD_SIZE = 100
+MAX_BYTES = 1 << 20  # Compressed bytes per log file before rotating
+FLUSH_INTERVAL = 1.0  # Seconds between writes
+MAX_PENDING = 100000  # Queued steps beyond which new ones are dropped rather than kept
+
+START, EVENTS, END = range(3)
+
+# Per-game counts kept for the game_end summary
+TALLIES = {
+    GameEvent.STRAWBERRY: "strawberries",
+    GameEvent.POWERUP: "powerups",
+    GameEvent.INVADER_SHOT: "invaders_shot",
+    GameEvent.INVADER_SHIELDED: "invaders_shielded",
+    GameEvent.BULLET_BLOCKED: "bullets_blocked",
+}
+
+def _event_fields(kind, payload):
+    if kind is GameEvent.POWERUP:
+        return {"powerup": payload.name.lower()}
+    if kind is GameEvent.LEVEL_UP:
+        return {"level": payload}
+    if kind is GameEvent.DEATH:
+        return {"cause": payload.name.lower()}
+    return {"cell": list(payload)}
+
+class EventLog:
+    # Call game_started() at the start of each game, record() with the
+    # events of every step that had some, game_ended() once it is over
+    # and close() on exit
+    def __init__(self, directory, max_bytes=MAX_BYTES, interval=FLUSH_INTERVAL,
+                 max_pending=MAX_PENDING, leaderboard_size=LEADERBOARD_SIZE):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.max_pending = max_pending
+        self.leaderboard_size = leaderboard_size
+        self.session = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self.queue = deque()
+        self.games = 0
+        self.dropped = 0  # Counted by the game thread
+        self.written = 0  # Records written, by the writer thread
+
+        # Writer thread only
+        self._reported = 0  # Drops already written as a record
+        self._file = None
+        self._part = 0
+        self._games = {}  # Game -> (start time, tallies) of games in progress
+        self.leaderboard = load_leaderboard(directory)
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="event-log", daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        if len(self.queue) >= self.max_pending:
+            self.dropped += 1
+            return
+        self.queue.append(item)
+
+    def game_started(self, state, **info):
+        # Returns the game's number for record() and game_ended()
+        self.games += 1
+        self._put((START, time.time(), self.games, state.tick,
+                   (state.seed, state.width, state.height, info)))
+        return self.games
+
+    def record(self, game, tick, events):
+        # events as returned by step(); the list isn't copied, since step()
+        # makes a new one every tick
+        self._put((EVENTS, time.time(), game, tick, events))
+
+    def game_ended(self, game, state):
+        death = state.death_cause.name.lower() if state.death_cause else "quit"
+        self._put((END, time.time(), game, state.tick, (state.score, state.level, death, state.seed)))
+
+    def close(self):
+        # Write what is queued and stop the writer; safe to call twice
+        if self._thread.is_alive():
+            self._stop.set()
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._flush()
+        self._flush()
+        if self._file is not None:
+            self._file.close()
+
+    def _flush(self):
+        queue = self.queue
+        records = []
+        board_changed = False
+        for _ in range(len(queue)):
+            kind, when, game, tick, payload = queue.popleft()
+            base = {"time": round(when, 3), "session": self.session, "game": game, "tick": tick}
+            if kind == EVENTS:
+                tallies = self._games.get(game, (when, {}))[1]
+                for event, value in payload:
+                    name = TALLIES.get(event)
+                    if name:
+                        tallies[name] = tallies.get(name, 0) + 1
+                    records.append(dict(base, event=event.name.lower(), **_event_fields(event, value)))
+            elif kind == START:
+                seed, width, height, info = payload
+                self._games[game] = (when, {})
+                records.append(dict(base, event="game_start", seed=seed, board=f"{width}x{height}", **info))
+            else:
+                score, level, death, seed = payload
+                started, tallies = self._games.pop(game, (when, {}))
+                summary = dict(base, event="game_end", score=score, level=level, ticks=tick,
+                               seconds=round(when - started, 3), death=death, seed=seed)
+                summary.update((name, tallies.get(name, 0)) for name in TALLIES.values())
+                records.append(summary)
+                board_changed |= self._rank(summary)
+        dropped = self.dropped
+        if dropped > self._reported:
+            records.append({"time": round(time.time(), 3), "session": self.session,
+                            "event": "dropped", "count": dropped - self._reported})
+            self._reported = dropped
+        if records:
+            self._write(records)
+        if board_changed:
+            save_leaderboard(self.directory, self.leaderboard)
+
+    def _write(self, records):
+        if self._file is not None and self._file.tell() >= self.max_bytes:
+            self._file.close()
+            self._file = None
+        if self._file is None:
+            self._part += 1
+            name = f"{LOG_PREFIX}{self.session}-{self._part:04d}{LOG_EXTENSION}"
+            self._file = open(os.path.join(self.directory, name), "ab")
+        lines = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+        self._file.write(gzip.compress(lines.encode(), mtime=0))
+        self._file.flush()
+        self.written += len(records)
+
+    def _rank(self, summary):
+        # Add a finished game to the leaderboard; True if it made the cut
+        self.leaderboard, added = rank_game(self.leaderboard, summary, self.leaderboard_size)
+        return added
+
+def leaderboard_entry(summary):
+    return {key: summary[key] for key in ("score", "level", "ticks", "death", "seed", "time",
+                                          "session", "game")}
+
+def rank_game(board, summary, size=LEADERBOARD_SIZE):
+    # (new board, whether the game is on it); best score first, and the
+    # earlier game first on equal scores
+    if len(board) >= size and summary["score"] <= board[-1]["score"]:
+        return board, False
+    board = board + [leaderboard_entry(summary)]
+    board.sort(key=lambda entry: (-entry["score"], entry["time"]))
+    del board[size:]
+    return board, True
+
+def load_leaderboard(directory):
+    try:
+        with open(os.path.join(directory, LEADERBOARD)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+def save_leaderboard(directory, board):
+    # Written to a temporary file first, so a crash never leaves half an index
+    path = os.path.join(directory, LEADERBOARD)
+    with open(path + ".tmp", "w") as f:
+        json.dump(board, f, indent=1)
+    os.replace(path + ".tmp", path)
+
+def log_files(directory):
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.startswith(LOG_PREFIX) and name.endswith(LOG_EXTENSION))
+
+def read_log(path):
+    # Records of one log file; a batch cut short by a crash ends it
+    with gzip.open(path, "rt") as f:
+        try:
+            for line in f:
+                yield json.loads(line)
+        except (EOFError, gzip.BadGzipFile, ValueError):
+            return
+
+def rebuild_leaderboard(directory, size=LEADERBOARD_SIZE):
+    board = []
+    for path in log_files(directory):
+        for record in read_log(path):
+            if record.get("event") == "game_end":
+                board = rank_game(board, record, size)[0]
+    save_leaderboard(directory, board)
+    return board
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show the leaderboard of a Cosmic Snake event log")
+    parser.add_argument("directory", help="log directory (cosmic_snake.py --log DIR)")
+    parser.add_argument("--top", type=int, default=10, help="games to show (default: 10)")
+    parser.add_argument("--rebuild", action="store_true",
+                        help=f"rebuild {LEADERBOARD} from the log files first")
+    args = parser.parse_args(argv)
+
+    board = rebuild_leaderboard(args.directory) if args.rebuild else load_leaderboard(args.directory)
+    if not board:
+        print("No finished games")
+        return 1
+    print(f"{'':>4} {'score':>7} {'level':>5} {'time':>7}  {'death':<8} {'date':<16} seed")
+    for rank, entry in enumerate(board[:args.top], 1):
+        date = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["time"]))
+        print(f"{rank:>4} {entry['score']:>7} {entry['level']:>5} {entry['ticks'] / SIM_RATE:>6.0f}s  "
+              f"{entry['death']:<8} {date:<16} {entry['seed']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,924 @@
+import random
+from array import array
+from collections import deque
+from enum import Enum
+
+from pool import EntityPool
+from schedule import Countdown, TimerQueue, geometric
+from spatial import CollisionGrid, FreeCellIndex
+
+# Headless simulation core for Cosmic Snake.
+# Nothing in here touches pygame, so it can be imported and stepped
+# without a display, a clock or SDL (bots, balance testing, replays).
+
+# Constants
+SCREEN_WIDTH = 800
+SCREEN_HEIGHT = 600
+GRID_SIZE = 20
+GRID_WIDTH = SCREEN_WIDTH // GRID_SIZE
+GRID_HEIGHT = SCREEN_HEIGHT // GRID_SIZE
+SNAKE_SPEED = 10  # Base speed, cells per second
+SPEED_BOOST = 5  # Extra cells per second while the speed powerup is active
+INVADER_SPEED = 1.5  # Cells per second
+BULLET_SPEED = 50  # Pixels per second
+INVADER_SPAWN_RATE = 0.02  # Probability of spawning an invader per frame
+MAX_INVADERS = 10
+INVADER_FIRE_RATE = 0.005  # Probability of an invader firing per frame
+LEVEL_SPAWN_RATE_STEP = 0.01  # Added to the invader spawn rate on every level-up
+LEVEL_SPEED_STEP = 0.2  # Added to the invader speed multiplier on every level-up
+
+# The simulation runs on a fixed timestep independent of the display.
+# SIM_RATE is a multiple of both snake speeds, so the snake moves every
+# whole number of ticks. Spawning and firing still happen once per
+# "frame" of the original 10 Hz loop, so their per-frame probabilities
+# above keep their meaning; they are scheduled rather than rolled for
+# every frame (see schedule.py), with the same odds.
+SIM_RATE = 30  # Simulation ticks per second
+SIM_DT = 1.0 / SIM_RATE
+FRAME_TICKS = SIM_RATE // SNAKE_SPEED
+INPUT_BUFFER = 3  # Turns that can be queued ahead of the snake
+
+# Direction enum
+class Direction(Enum):
+    UP = (0, -1)
+    DOWN = (0, 1)
+    LEFT = (-1, 0)
+    RIGHT = (1, 0)
+
+# PowerUp types
+class PowerUpType(Enum):
+    SPEED = 0
+    SHIELD = 1
+    BULLET = 2
+
+# Small integer codes for the enums above, as stored in replays, save
+# states and snapshots; new members go at the end so old data still reads
+DIRECTION_CODES = {direction: i for i, direction in enumerate(Direction)}
+CODE_DIRECTIONS = list(Direction)
+POWERUP_CODES = {powerup_type: i for i, powerup_type in enumerate(PowerUpType)}
+CODE_POWERUPS = list(PowerUpType)
+
+# Things that happened during a step, for scoring, HUD and logging
+class GameEvent(Enum):
+    STRAWBERRY = 0
+    POWERUP = 1
+    INVADER_SHOT = 2
+    INVADER_SHIELDED = 3
+    BULLET_BLOCKED = 4
+    LEVEL_UP = 5
+    DEATH = 6
+
+class DeathCause(Enum):
+    SELF = 0
+    INVADER = 1
+    BULLET = 2
+    SNAKE = 3  # Ran into another snake on a shared board
+
+def rect_cells(x, y, w, h, width, height):
+    # Packed indices of the on-board grid cells a pixel rect overlaps;
+    # same overlap rule as pygame.Rect.colliderect against each cell rect
+    cells = []
+    for row in range(max(y // GRID_SIZE, 0), min((y + h - 1) // GRID_SIZE, height - 1) + 1):
+        for col in range(max(x // GRID_SIZE, 0), min((x + w - 1) // GRID_SIZE, width - 1) + 1):
+            cells.append(row * width + col)
+    return cells
+
+def board_size(text):
+    # "WIDTHxHEIGHT" in cells, as given on the command line
+    width, height = (int(n) for n in text.lower().split("x"))
+    if not (1 <= width <= 65535 and 1 <= height <= 65535):
+        raise ValueError(f"board size out of range: {text!r}")
+    return width, height
+
+# Game object classes
+class Snake:
+    # The body is a ring buffer of packed cell indices (y * width + x),
+    # head first, plus a per-cell occupancy counter, so moving, growing and
+    # "is this cell part of the snake" are all O(1) regardless of length.
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT, start=None):
+        self.width = width
+        self.height = height
+        self.capacity = width * height  # The snake can never be longer than the board
+        # Cell the head starts on, the middle of the board unless given
+        self.start = (height // 2) * width + width // 2 if start is None else start
+        self.body = array("i", bytes(4 * self.capacity))
+        self.occupancy = bytearray(self.capacity)
+        self.reset()
+
+    def reset(self):
+        self.occupancy[:] = bytes(self.capacity)
+        self.head_index = 0
+        self.size = 1
+        self.head_cell = self.start
+        self.body[0] = self.head_cell
+        self.occupancy[self.head_cell] = 1
+        self.vacated = -1  # Cell the tail left on the last move, -1 if none
+        self.moves = 0  # Successful moves since reset
+        self.length = 3
+        self.direction = Direction.RIGHT
+        self.turns = deque()  # Queued (direction, stamp) turns, oldest first
+        self.turn_stamp = None  # Stamp of the turn applied by the last move
+        self.growing = False
+        self.speed_boost = 0
+        self.shield_active = False
+        self.shield_timer = 0
+        self.can_shoot = False
+        self.bullet_timer = 0
+        self.shot_cooldown = 500  # milliseconds of simulation time
+        self.last_shot_time = -self.shot_cooldown  # First shot is never on cooldown
+
+    def get_head_position(self):
+        return (self.head_cell % self.width, self.head_cell // self.width)
+
+    def tail_cell(self):
+        return self.body[(self.head_index + self.size - 1) % self.capacity]
+
+    def cells(self):
+        # Body cells from head to tail
+        body = self.body
+        capacity = self.capacity
+        start = self.head_index
+        for i in range(self.size):
+            yield body[(start + i) % capacity]
+
+    @property
+    def positions(self):
+        width = self.width
+        return [(c % width, c // width) for c in self.cells()]
+
+    def occupies(self, x, y):
+        return self.occupancy[y * self.width + x] > 0
+
+    def change_direction(self, direction, stamp=None):
+        # Queue a turn; each move applies at most one, so quick presses
+        # between two moves are kept instead of overwriting each other.
+        # Returns False if the turn was dropped. `stamp` (e.g. when the key
+        # was read) comes back in turn_stamp once the turn is applied.
+        turns = self.turns
+        last = turns[-1][0] if turns else self.direction
+        if direction == last or len(turns) >= INPUT_BUFFER:
+            return False
+        if self.size > 1:
+            # Prevent the snake from reversing into the last queued direction
+            dx, dy = direction.value
+            last_dx, last_dy = last.value
+            if dx == -last_dx and dy == -last_dy:
+                return False
+        turns.append((direction, stamp))
+        return True
+
+    def next_cell(self):
+        # Cell the next move() would enter
+        head = self.head_cell
+        dx, dy = (self.turns[0][0] if self.turns else self.direction).value
+        return ((head // self.width + dy) % self.height) * self.width + (head % self.width + dx) % self.width
+
+    def move(self):
+        head = self.head_cell
+        turns = self.turns
+        direction = turns[0][0] if turns else self.direction
+        dx, dy = direction.value
+        new_x = (head % self.width + dx) % self.width
+        new_y = (head // self.width + dy) % self.height
+        new_head = new_y * self.width + new_x
+        self.vacated = -1
+
+        # Check for collision with self; a blocked turn stays queued
+        if self.occupancy[new_head] and new_head != head:
+            return False
+
+        self.head_index = (self.head_index - 1) % self.capacity
+        self.body[self.head_index] = new_head
+        self.occupancy[new_head] += 1
+        self.head_cell = new_head
+        self.size += 1
+        self.moves += 1
+        self.direction = direction
+        if turns:
+            self.turn_stamp = turns.popleft()[1]
+
+        if not self.growing:
+            tail = self.tail_cell()
+            self.occupancy[tail] -= 1
+            self.size -= 1
+            self.vacated = tail
+        else:
+            self.growing = False
+            self.length += 1
+
+        return True
+
+    def grow(self):
+        self.growing = True
+
+    def move_interval(self):
+        # Ticks between moves
+        return SIM_RATE // (SNAKE_SPEED + (self.speed_boost > 0) * SPEED_BOOST)
+
+    # Powerup durations are in seconds; the timers count simulation ticks
+    def activate_speed_boost(self, duration=5):
+        self.speed_boost = duration * SIM_RATE
+
+    def activate_shield(self, duration=5):
+        self.shield_active = True
+        self.shield_timer = duration * SIM_RATE
+
+    def activate_bullet_powerup(self, duration=10):
+        self.can_shoot = True
+        self.bullet_timer = duration * SIM_RATE
+
+    def collect(self, powerup_type):
+        if powerup_type == PowerUpType.SPEED:
+            self.activate_speed_boost()
+        elif powerup_type == PowerUpType.SHIELD:
+            self.activate_shield()
+        elif powerup_type == PowerUpType.BULLET:
+            self.activate_bullet_powerup()
+
+    def update_powerups(self):
+        if self.speed_boost > 0:
+            self.speed_boost -= 1
+
+        if self.shield_active:
+            self.shield_timer -= 1
+            if self.shield_timer <= 0:
+                self.shield_active = False
+
+        if self.can_shoot:
+            self.bullet_timer -= 1
+            if self.bullet_timer <= 0:
+                self.can_shoot = False
+
+    def shoot(self, current_time):
+        # Position for a new upward bullet, or None if the snake can't shoot
+        if not self.can_shoot:
+            return None
+
+        if current_time - self.last_shot_time < self.shot_cooldown:
+            return None
+
+        self.last_shot_time = current_time
+        head = self.get_head_position()
+        # Adjust bullet position to be centered at the head
+        return (head[0] * GRID_SIZE + GRID_SIZE // 2, head[1] * GRID_SIZE)
+
+class Strawberry:
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT, free_cells=None, rng=random):
+        self.width = width
+        self.height = height
+        self.rng = rng
+        self.position = (0, 0)
+        self.randomize_position(free_cells)
+
+    def randomize_position(self, free_cells=None):
+        # Pick a cell not covered by the snake, an invader or a powerup.
+        # Returns False (and leaves no strawberry) when the board is full.
+        if free_cells is None:
+            cell = self.rng.randrange(self.width * self.height)
+        else:
+            cell = free_cells.sample(self.rng)
+        if cell is None:
+            self.position = None
+            return False
+        self.position = (cell % self.width, cell // self.width)
+        return True
+
+# Invaders, bullets and powerups live in EntityPools, so they are reused:
+# reset() does the work of __init__ and every attribute is in __slots__
+class Invader:
+    __slots__ = ("grid_x", "grid_y", "prev_y", "width", "height", "cell", "speed", "fire_tick",
+                 "slot", "uid")
+
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT, rng=random, speed=INVADER_SPEED):
+        self.reset(width, height, rng, speed)
+
+    def reset(self, width=GRID_WIDTH, height=GRID_HEIGHT, rng=random, speed=INVADER_SPEED):
+        self.grid_x = rng.randint(0, width - 1)
+        self.grid_y = 0  # Start at the top
+        self.prev_y = 0  # Position one tick ago, for interpolated drawing
+        self.width = width
+        self.height = height
+        self.cell = self.grid_x  # Packed index of the cell it covers
+        self.speed = speed
+        self.fire_tick = None  # Tick it fires on next (GameState.schedule_fire)
+
+    def move(self):
+        self.prev_y = self.grid_y
+        self.grid_y += self.speed * SIM_DT
+
+        # Check if the invader has reached the bottom
+        row = int(self.grid_y)
+        if row >= self.height:
+            return False
+        self.cell = row * self.width + self.grid_x
+        return True
+
+    def get_position(self):
+        return (int(self.grid_x), int(self.grid_y))
+
+    def ticks_left(self):
+        # Upper bound on the ticks before it leaves the bottom of the board
+        return int((self.height - self.grid_y) / (self.speed * SIM_DT)) + 2
+
+    def fire(self):
+        # Position for a new downward bullet
+        return (self.grid_x * GRID_SIZE + GRID_SIZE // 2,
+                int(self.grid_y) * GRID_SIZE + GRID_SIZE)
+
+class Bullet:
+    __slots__ = ("x", "y", "prev_y", "direction", "owner", "speed", "width", "height", "slot", "uid")
+
+    def __init__(self, position, direction, owner=None):
+        self.reset(position, direction, owner)
+
+    def reset(self, position, direction, owner=None):
+        self.x, self.y = position
+        self.prev_y = self.y  # Position one tick ago, for interpolated drawing
+        self.direction = direction  # 1 for down (invader), -1 for up (snake)
+        self.owner = owner  # Seat that fired it on a shared board
+        self.speed = BULLET_SPEED
+        self.width = 4
+        self.height = 10
+
+    def move(self, limit=SCREEN_HEIGHT):
+        self.prev_y = self.y
+        self.y += self.direction * self.speed * SIM_DT
+
+        # Check if bullet is off-screen
+        if self.y < 0 or self.y > limit:
+            return False
+        return True
+
+    def get_rect(self):
+        return (self.x - self.width // 2, int(self.y) - self.height // 2,
+                self.width, self.height)
+
+class PowerUp:
+    __slots__ = ("type", "grid_x", "grid_y", "prev_y", "width", "height", "cell", "speed",
+                 "active_time", "slot", "uid")
+
+    def __init__(self, powerup_type, width=GRID_WIDTH, height=GRID_HEIGHT, rng=random):
+        self.reset(powerup_type, width, height, rng)
+
+    def reset(self, powerup_type, width=GRID_WIDTH, height=GRID_HEIGHT, rng=random):
+        self.type = powerup_type
+        self.grid_x = rng.randint(0, width - 1)
+        self.grid_y = 0  # Start at the top
+        self.prev_y = 0  # Position one tick ago, for interpolated drawing
+        self.width = width
+        self.height = height
+        self.cell = self.grid_x  # Packed index of the cell it covers
+        self.speed = INVADER_SPEED * 0.8  # Slightly slower than invaders
+        self.active_time = 10 * SIM_RATE  # Active for 10 seconds
+
+    def move(self):
+        self.prev_y = self.grid_y
+        self.grid_y += self.speed * SIM_DT
+
+        # Check if the powerup has reached the bottom
+        row = int(self.grid_y)
+        if row >= self.height:
+            return False
+        self.cell = row * self.width + self.grid_x
+        return True
+
+    def get_grid_position(self):
+        return (int(self.grid_x), int(self.grid_y))
+
+# Player input for a single tick: the turns pressed since the last tick,
+# in order, and whether to shoot
+class Action:
+    __slots__ = ("turns", "shoot")
+
+    def __init__(self, direction=None, shoot=False):
+        self.turns = [] if direction is None else [(direction, None)]
+        self.shoot = shoot
+
+    def turn(self, direction, stamp=None):
+        self.turns.append((direction, stamp))
+
+NOOP = Action()
+
+# Everything that used to live in main()'s locals
+class GameState:
+    # All randomness in a game comes from its own RNG, so a game is fully
+    # determined by its seed and the actions passed to step()
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT, collisions=None, seed=None):
+        self.width = width
+        self.height = height
+        self.pixel_height = height * GRID_SIZE
+        self.seed = seed if seed is not None else random.randrange(1 << 32)
+        self.rng = random.Random(self.seed)
+        self.snake = Snake(width, height)
+        self.snakes = [self.snake]  # Every snake on the board, for drawing
+        # Cells not covered by the snake, invaders or powerups
+        self.free_cells = FreeCellIndex(width * height)
+        self.free_cells.occupy(self.snake.head_cell)
+        self.strawberry = Strawberry(width, height, self.free_cells, self.rng)
+        self.invaders = EntityPool(Invader)
+        self.bullets = EntityPool(Bullet)
+        self.powerups = EntityPool(PowerUp)
+
+        self.score = 0
+        self.level = 1
+        self.tick = 0
+        self.time = 0.0  # milliseconds of simulation time
+        self.snake_wait = self.snake.move_interval()  # Ticks until the snake moves
+
+        # Difficulty increases with level. These start from the module
+        # constants but can be changed per game (balance testing).
+        self.invader_spawn_rate = INVADER_SPAWN_RATE
+        self.invader_speed_multiplier = 1.0
+        self.max_invaders = MAX_INVADERS
+        self.invader_fire_rate = INVADER_FIRE_RATE
+        self.level_spawn_rate_step = LEVEL_SPAWN_RATE_STEP
+        self.level_speed_step = LEVEL_SPEED_STEP
+
+        # Spawns and invader fire are drawn ahead (schedule.py). Each
+        # schedule remembers the rate it was drawn for and is redrawn
+        # when the rate changes.
+        self.invader_spawns = Countdown()
+        self.powerup_spawns = Countdown()
+        self.fire_timers = TimerQueue()  # (tick, invader uid, invader)
+        self.fire_schedule_rate = self.invader_fire_rate
+
+        self.game_over = False
+        self.death_cause = None
+        self.events = []
+        self.collisions = collisions if collisions is not None else GridCollisions()
+        self.profiler = None  # Optional profiling.FrameProfiler, lapped per phase
+
+    def spawn_invader(self):
+        # Invaders keep the speed of the level they spawned on
+        invader = self.invaders.spawn(self.width, self.height, self.rng,
+                                      INVADER_SPEED * self.invader_speed_multiplier)
+        self.free_cells.occupy(invader.cell)
+        self.schedule_fire(invader, self.tick)
+        return invader
+
+    def schedule_fire(self, invader, first):
+        # Draw the next frame tick `invader` fires on, counting the frame
+        # tick `first` as its next roll; none if that is after it has left
+        frames = geometric(self.rng, self.invader_fire_rate)
+        invader.fire_tick = None
+        if frames is not None:
+            tick = first + (frames - 1) * FRAME_TICKS
+            if tick <= self.tick + invader.ticks_left():
+                invader.fire_tick = tick
+                self.fire_timers.push(tick, invader.uid, invader)
+
+    def reschedule_fire(self):
+        # After a change of invader_fire_rate, from this frame on
+        self.fire_schedule_rate = self.invader_fire_rate
+        self.fire_timers.clear()
+        for invader in self.invaders:
+            self.schedule_fire(invader, self.tick)
+
+    def remove_invader(self, invader):
+        self.invaders.remove(invader)
+        self.free_cells.release(invader.cell)
+
+    def spawn_powerup(self, powerup_type):
+        powerup = self.powerups.spawn(powerup_type, self.width, self.height, self.rng)
+        self.free_cells.occupy(powerup.cell)
+        return powerup
+
+    def remove_powerup(self, powerup):
+        self.powerups.remove(powerup)
+        self.free_cells.release(powerup.cell)
+
+    def die(self, cause):
+        self.game_over = True
+        self.death_cause = cause
+        self.events.append((GameEvent.DEATH, cause))
+
+def step(state, action=NOOP):
+    # Advance the game by one fixed tick (SIM_DT seconds) and return the
+    # events it produced
+    state.events = []
+    if state.game_over:
+        return state.events
+
+    snake = state.snake
+    for direction, stamp in action.turns:
+        snake.change_direction(direction, stamp)
+    if action.shoot:
+        position = snake.shoot(state.time)
+        if position:
+            state.bullets.spawn(position, -1)  # -1 for upward direction
+
+    state.tick += 1
+    state.time = state.tick * 1000.0 / SIM_RATE
+    free_cells = state.free_cells
+    profiler = state.profiler
+    if profiler:
+        profiler.lap("input")
+
+    # Move snake when it is due; the speed boost shortens the wait
+    state.snake_wait -= 1
+    if state.snake_wait <= 0:
+        state.snake_wait = snake.move_interval()
+        if snake.move():
+            free_cells.occupy(snake.head_cell)
+            if snake.vacated != -1:
+                free_cells.release(snake.vacated)
+        elif not snake.shield_active:  # Shield protects from self-collision
+            state.die(DeathCause.SELF)
+            return state.events
+
+        # Check if snake eats the strawberry
+        head = snake.get_head_position()
+        if head == state.strawberry.position:
+            snake.grow()
+            state.score += 10
+            state.events.append((GameEvent.STRAWBERRY, head))
+            state.strawberry.randomize_position(free_cells)
+
+            # Level up after every 5 strawberries
+            if state.score % 50 == 0:
+                state.level += 1
+                state.invader_spawn_rate += state.level_spawn_rate_step
+                state.invader_speed_multiplier += state.level_speed_step
+                state.events.append((GameEvent.LEVEL_UP, state.level))
+    if profiler:
+        profiler.lap("snake")
+
+    if state.strawberry.position is None:
+        # The board was full last time; try again now that cells may have freed up
+        state.strawberry.randomize_position(free_cells)
+
+    # Update powerups
+    snake.update_powerups()
+
+    _update_entities(state)
+    state.collisions.resolve(state)
+    return state.events
+
+def _update_entities(state):
+    # Everything in a tick that isn't a snake: spawning, invader fire and
+    # moving invaders, powerups and bullets
+    free_cells = state.free_cells
+    invaders = state.invaders
+    powerups = state.powerups
+    bullets = state.bullets
+    profiler = state.profiler
+
+    # Spawning and firing happen once per original frame
+    rng = state.rng
+    frame = state.tick % FRAME_TICKS == 0
+    if frame:
+        if state.invader_fire_rate != state.fire_schedule_rate:
+            state.reschedule_fire()
+
+        # Spawn invaders (one roll per frame while there is room)
+        if len(invaders) < state.max_invaders and state.invader_spawns.trial(rng, state.invader_spawn_rate):
+            state.spawn_invader()
+
+        # Spawn powerups (10% of the invader spawn rate)
+        if state.powerup_spawns.trial(rng, 0.1 * state.invader_spawn_rate):
+            powerup_type = rng.choice(list(PowerUpType))
+            state.spawn_powerup(powerup_type)
+    if profiler:
+        profiler.lap("spawn")
+
+    # Each pass below is one sweep over the pool: removing an entity moves
+    # the last one into its slot, which is then visited next
+
+    # Move invaders
+    items = invaders.items
+    i = 0
+    while i < len(items):
+        invader = items[i]
+        old_cell = invader.cell
+        if not invader.move():
+            state.remove_invader(invader)
+            continue
+        if invader.cell != old_cell:
+            free_cells.move(old_cell, invader.cell)
+        i += 1
+
+    # Only the invaders due to fire are visited; timers of invaders that
+    # have gone (or whose slot was reused) are skipped
+    if frame:
+        tick = state.tick
+        for due, uid, invader in state.fire_timers.pop_due(tick):
+            if invader.uid == uid and invader.fire_tick == due and invader.slot != -1:
+                bullets.spawn(invader.fire(), 1)  # 1 for downward direction
+                state.schedule_fire(invader, tick + FRAME_TICKS)
+    if profiler:
+        profiler.lap("invaders")
+
+    # Move powerups
+    items = powerups.items
+    i = 0
+    while i < len(items):
+        powerup = items[i]
+        old_cell = powerup.cell
+        if not powerup.move():
+            state.remove_powerup(powerup)
+            continue
+        if powerup.cell != old_cell:
+            free_cells.move(old_cell, powerup.cell)
+        i += 1
+    if profiler:
+        profiler.lap("powerups")
+
+    # Move bullets
+    pixel_height = state.pixel_height
+    items = bullets.items
+    i = 0
+    while i < len(items):
+        bullet = items[i]
+        if bullet.move(pixel_height):
+            i += 1
+        else:
+            bullets.remove(bullet)
+    if profiler:
+        profiler.lap("bullets")
+
+# Resolves every collision of a tick in one pass. Invaders and powerups are
+# bucketed by cell, so each check looks at one or two cells instead of
+# every entity; the snake body is already indexed by Snake.occupancy.
+# Any object with a resolve(state) method can be passed to GameState.
+class GridCollisions:
+    def __init__(self):
+        self.invaders = CollisionGrid()
+        self.powerups = CollisionGrid()
+
+    def resolve(self, state):
+        snake = state.snake
+        head_cell = snake.head_cell
+        head = snake.get_head_position()
+        events = state.events
+        profiler = state.profiler
+
+        invaders = self.invaders
+        invaders.clear()
+        for invader in state.invaders:
+            invaders.insert(invader.cell, invader)
+
+        # Invaders on the head: destroyed by the shield, fatal without it
+        for invader in list(invaders.get(head_cell)):
+            if not snake.shield_active:
+                state.die(DeathCause.INVADER)
+                return
+            invaders.remove(head_cell, invader)
+            state.remove_invader(invader)
+            state.score += 5
+            events.append((GameEvent.INVADER_SHIELDED, head))
+        if profiler:
+            profiler.lap("collide_invaders")
+
+        powerups = self.powerups
+        powerups.clear()
+        for powerup in state.powerups:
+            powerups.insert(powerup.cell, powerup)
+
+        # Powerups on the head get collected
+        for powerup in powerups.get(head_cell):
+            snake.collect(powerup.type)
+            state.remove_powerup(powerup)
+            state.score += 15
+            events.append((GameEvent.POWERUP, powerup.type))
+        if profiler:
+            profiler.lap("collide_powerups")
+
+        width = state.width
+        height = state.height
+        occupancy = snake.occupancy
+        spent = []
+        for bullet in state.bullets:
+            bx, by, bw, bh = bullet.get_rect()
+            cells = rect_cells(bx, by, bw, bh, width, height)
+
+            # Snake bullets (going up) destroy the first invader they touch
+            if bullet.direction < 0:
+                invader = invaders.first(cells)
+                if invader is not None:
+                    invaders.remove(invader.cell, invader)
+                    state.remove_invader(invader)
+                    spent.append(bullet)
+                    state.score += 20
+                    events.append((GameEvent.INVADER_SHOT, invader.get_position()))
+
+            # Invader bullets (going down) are stopped by the shield on the head
+            # and fatal anywhere else on the snake
+            elif head_cell in cells:
+                if not snake.shield_active:
+                    state.die(DeathCause.BULLET)
+                    return
+                spent.append(bullet)
+                events.append((GameEvent.BULLET_BLOCKED, head))
+            else:
+                for cell in cells:
+                    if occupancy[cell]:
+                        state.die(DeathCause.BULLET)
+                        return
+
+        for bullet in spent:
+            state.bullets.remove(bullet)
+        if profiler:
+            profiler.lap("collide_bullets")
+
+# Shared boards: several snakes on one board, for server.py's rooms. The
+# strawberry, invaders, powerups and level are shared; each snake sits in
+# a Seat with its own score and move timer. Snakes move in seat order, and
+# running into another snake is like running into yourself: the shield
+# blocks the move, otherwise the snake is out. A snake that is out is
+# taken off the board, and the game is over once every seat is out.
+class Seat:
+    def __init__(self, snake):
+        self.snake = snake
+        self.score = 0
+        self.wait = snake.move_interval()  # Ticks until the snake moves
+        self.out = False
+        self.death_cause = None  # Stays None if the player left instead
+
+class SharedState(GameState):
+    # Seat 0 holds `snake`; score and snake_wait are kept per seat instead
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT, seed=None):
+        GameState.__init__(self, width, height, SharedCollisions(), seed)
+        self.seats = [Seat(self.snake)]
+
+    def add_seat(self):
+        # Seat a new snake and return its index; None if the board is full.
+        # Each one starts a quarter of the board below the last, in the
+        # middle column, or on the first free cell after that.
+        index = len(self.seats)
+        width = self.width
+        cells = width * self.height
+        start = (self.height // 2 + index * max(self.height // 4, 1)) % self.height * width + width // 2
+        strawberry = self.strawberry.position
+        taken = -1 if strawberry is None else strawberry[1] * width + strawberry[0]
+        for i in range(cells):
+            cell = (start + i) % cells
+            if self.free_cells.is_free(cell) and cell != taken:
+                break
+        else:
+            return None
+        snake = Snake(width, self.height, cell)
+        self.free_cells.occupy(cell)
+        self.snakes.append(snake)
+        self.seats.append(Seat(snake))
+        return index
+
+    def knock_out(self, index, cause=None):
+        # Take a seat's snake off the board: dead of `cause`, or gone with
+        # its player if cause is None
+        seat = self.seats[index]
+        if seat.out:
+            return
+        seat.out = True
+        seat.death_cause = cause
+        snake = seat.snake
+        for cell in snake.cells():
+            self.free_cells.release(cell)
+        snake.occupancy[:] = bytes(snake.capacity)
+        snake.size = 0
+        snake.turns.clear()
+        if cause is not None:
+            self.events.append((index, GameEvent.DEATH, cause))
+        self.game_over = all(seat.out for seat in self.seats)
+
+def step_shared(state, actions):
+    # step() for a SharedState, with actions[i] the input of seat i. The
+    # events come back as (seat, kind, payload).
+    state.events = []
+    if state.game_over:
+        return state.events
+
+    seats = state.seats
+    for index, seat in enumerate(seats):
+        if seat.out:
+            continue
+        snake = seat.snake
+        action = actions[index]
+        for direction, stamp in action.turns:
+            snake.change_direction(direction, stamp)
+        if action.shoot:
+            position = snake.shoot(state.time)
+            if position:
+                state.bullets.spawn(position, -1, index)
+
+    state.tick += 1
+    state.time = state.tick * 1000.0 / SIM_RATE
+    free_cells = state.free_cells
+    events = state.events
+
+    for index, seat in enumerate(seats):
+        if seat.out:
+            continue
+        seat.wait -= 1
+        if seat.wait > 0:
+            continue
+        snake = seat.snake
+        seat.wait = snake.move_interval()
+        cell = snake.next_cell()
+        if any(other.occupancy[cell] for other in state.snakes if other is not snake):
+            if not snake.shield_active:
+                state.knock_out(index, DeathCause.SNAKE)
+            continue
+        if snake.move():
+            free_cells.occupy(snake.head_cell)
+            if snake.vacated != -1:
+                free_cells.release(snake.vacated)
+        else:
+            if not snake.shield_active:
+                state.knock_out(index, DeathCause.SELF)
+            continue
+
+        head = snake.get_head_position()
+        if head == state.strawberry.position:
+            snake.grow()
+            seat.score += 10
+            events.append((index, GameEvent.STRAWBERRY, head))
+            state.strawberry.randomize_position(free_cells)
+
+            # Every fifth strawberry of a player raises the level for everyone
+            if seat.score % 50 == 0:
+                state.level += 1
+                state.invader_spawn_rate += state.level_spawn_rate_step
+                state.invader_speed_multiplier += state.level_speed_step
+                events.append((index, GameEvent.LEVEL_UP, state.level))
+
+    if state.strawberry.position is None:
+        state.strawberry.randomize_position(free_cells)
+    for seat in seats:
+        if not seat.out:
+            seat.snake.update_powerups()
+
+    _update_entities(state)
+    state.collisions.resolve(state)
+    return state.events
+
+# GridCollisions for a SharedState: the same rules, checked for every seat
+class SharedCollisions(GridCollisions):
+    def resolve(self, state):
+        events = state.events
+        invaders = self.invaders
+        invaders.clear()
+        for invader in state.invaders:
+            invaders.insert(invader.cell, invader)
+        powerups = self.powerups
+        powerups.clear()
+        for powerup in state.powerups:
+            powerups.insert(powerup.cell, powerup)
+
+        seats = state.seats
+        for index, seat in enumerate(seats):
+            if seat.out:
+                continue
+            snake = seat.snake
+            head_cell = snake.head_cell
+            head = snake.get_head_position()
+            for invader in list(invaders.get(head_cell)):
+                if not snake.shield_active:
+                    state.knock_out(index, DeathCause.INVADER)
+                    break
+                invaders.remove(head_cell, invader)
+                state.remove_invader(invader)
+                seat.score += 5
+                events.append((index, GameEvent.INVADER_SHIELDED, head))
+            if seat.out:
+                continue
+            for powerup in list(powerups.get(head_cell)):
+                snake.collect(powerup.type)
+                powerups.remove(head_cell, powerup)
+                state.remove_powerup(powerup)
+                seat.score += 15
+                events.append((index, GameEvent.POWERUP, powerup.type))
+
+        width = state.width
+        height = state.height
+        spent = []
+        for bullet in state.bullets:
+            bx, by, bw, bh = bullet.get_rect()
+            cells = rect_cells(bx, by, bw, bh, width, height)
+
+            # A snake bullet scores for the seat that fired it
+            if bullet.direction < 0:
+                invader = invaders.first(cells)
+                if invader is not None:
+                    invaders.remove(invader.cell, invader)
+                    state.remove_invader(invader)
+                    spent.append(bullet)
+                    seats[bullet.owner].score += 20
+                    events.append((bullet.owner, GameEvent.INVADER_SHOT, invader.get_position()))
+                continue
+
+            # An invader bullet stops at the first snake it touches
+            for index, seat in enumerate(seats):
+                if seat.out:
+                    continue
+                snake = seat.snake
+                if snake.head_cell in cells and snake.shield_active:
+                    events.append((index, GameEvent.BULLET_BLOCKED, snake.get_head_position()))
+                elif not any(snake.occupancy[cell] for cell in cells):
+                    continue
+                else:
+                    state.knock_out(index, DeathCause.BULLET)
+                spent.append(bullet)
+                break
+
+        for bullet in spent:
+            state.bullets.remove(bullet)
@@ -0,0 +1,318 @@
+import struct
+import sys
+from array import array
+from collections import deque
+
+from game_core import CODE_DIRECTIONS, CODE_POWERUPS, DIRECTION_CODES, POWERUP_CODES, Action, GameState, Snake
+
+# Wire format shared by server.py and client.py. Every message is a frame:
+#   FRAME    payload length (I), message type (B), then the payload
+# Messages (little-endian throughout):
+#   HELLO     client -> server: room to join (i, -1 for any)
+#   WELCOME   server -> client: player index (B), room (I), seed (Q),
+#             board width (H) and height (H), players per room (B)
+#   INPUT     client -> server: last snapshot tick received (I), flags (B:
+#             bit 7 = shoot, low 7 bits = number of turns), then the turns
+#             packed four 2-bit direction codes a byte, as in replays
+#   SNAPSHOT  server -> client: SNAPSHOT_HEADER, then for every snake on
+#             the board (one per seat) SNAKE_HEADER and the newest head
+#             cells (I each, oldest first), then for invaders, powerups and
+#             bullets in turn ENTITY_HEADER, the uids that despawned (I
+#             each) and the records of those that spawned, then the room's
+#             scoreboard: count (B) and a SCORE record per seat
+#
+# Snapshots are deltas against the last one the client acknowledged. A
+# snake only ever gains cells at the head and loses them at the tail, so
+# its delta is the cells the head entered since then plus the new length;
+# a snake that is new since then is sent whole.
+# Invaders, powerups and bullets move at a constant speed, which the
+# client reproduces, so they are only sent when they spawn and despawn.
+# The client's copy may already be newer than the base (acks lag behind),
+# so every count in the delta is absolute: `moves` says how many of the
+# heads the client still lacks, and entities with uids the pool handed
+# out after the base that aren't among the spawns have come and gone.
+
+FRAME = struct.Struct("<IB")
+HELLO, WELCOME, INPUT, SNAPSHOT = 1, 2, 3, 4
+MAX_CLIENT_FRAME = 1024  # Clients only send small messages
+
+HELLO_BODY = struct.Struct("<i")
+WELCOME_BODY = struct.Struct("<BIQHHB")
+INPUT_HEADER = struct.Struct("<IB")
+SNAPSHOT_HEADER = struct.Struct("<IHBiB")  # tick, level, flags, strawberry, snakes
+SNAKE_HEADER = struct.Struct("<IIIBB")  # moves, size, heads sent, direction, snake flags
+ENTITY_HEADER = struct.Struct("<III")  # Uids handed out by the base, despawns, spawns
+INVADER_RECORD = struct.Struct("<IHfd")  # uid, column, row, speed
+POWERUP_RECORD = struct.Struct("<IHBf")  # uid, column, type, row
+BULLET_RECORD = struct.Struct("<Iifb")  # uid, x, y in pixels, direction
+SCORE = struct.Struct("<IB")  # score, status
+
+SHOOT = 0x80
+MAX_TURNS = 0x7F
+
+# Snapshot flags (GAME_OVER: the client's own snake is out) and snake
+# flags (FULL there: the whole body was sent)
+SHIELD, SPEED, CAN_SHOOT, GAME_OVER, FULL = 1, 2, 4, 8, 16
+# Scoreboard status
+ALIVE, CONNECTED = 1, 2
+
+HISTORY = 64  # Unacknowledged snapshots kept per client before sending a full one
+
+def frame(kind, payload=b""):
+    return FRAME.pack(len(payload), kind) + payload
+
+def _uids(values):
+    data = array("I", values)
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data.tobytes()
+
+def _read_uids(data, pos, count):
+    values = array("I")
+    values.frombytes(data[pos:pos + 4 * count])
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values, pos + 4 * count
+
+async def read_frame(reader, limit=None):
+    # (type, payload) of the next frame on an asyncio StreamReader
+    length, kind = FRAME.unpack(await reader.readexactly(FRAME.size))
+    if limit is not None and length > limit:
+        raise ValueError(f"frame of {length} bytes is too big")
+    return kind, await reader.readexactly(length)
+
+class FrameReader:
+    # Splits bytes read from a plain socket into (type, payload) frames
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        self.buffer += data
+        frames = []
+        buffer = self.buffer
+        pos = 0
+        while len(buffer) - pos >= FRAME.size:
+            length, kind = FRAME.unpack_from(buffer, pos)
+            end = pos + FRAME.size + length
+            if end > len(buffer):
+                break
+            frames.append((kind, bytes(buffer[pos + FRAME.size:end])))
+            pos = end
+        del buffer[:pos]
+        return frames
+
+def encode_input(ack, action):
+    turns = action.turns[:MAX_TURNS]
+    out = bytearray(INPUT_HEADER.pack(ack, len(turns) | (SHOOT if action.shoot else 0)))
+    for i in range(0, len(turns), 4):
+        packed = 0
+        for j, (direction, stamp) in enumerate(turns[i:i + 4]):
+            packed |= DIRECTION_CODES[direction] << (2 * j)
+        out.append(packed)
+    return bytes(out)
+
+def decode_input(payload):
+    # (ack, Action); ValueError if the payload isn't a whole INPUT message
+    if len(payload) < INPUT_HEADER.size:
+        raise ValueError("short INPUT message")
+    ack, flags = INPUT_HEADER.unpack_from(payload)
+    if len(payload) != INPUT_HEADER.size + ((flags & MAX_TURNS) + 3) // 4:
+        raise ValueError("INPUT message length doesn't match its turns")
+    action = Action(shoot=bool(flags & SHOOT))
+    pos = INPUT_HEADER.size
+    for i in range(flags & MAX_TURNS):
+        if i % 4 == 0:
+            packed = payload[pos]
+            pos += 1
+        action.turn(CODE_DIRECTIONS[(packed >> (2 * (i % 4))) & 3])
+    return ack, action
+
+class SnapshotHistory:
+    # Server side: what was sent to one client, by tick, so the next
+    # snapshot can be a delta against the last one it acknowledged
+    def __init__(self, limit=HISTORY):
+        self.limit = limit
+        self.sent = {}  # tick -> (moves per snake, (uids handed out, live uids) per pool)
+        self.ticks = deque()
+        self.ack = None
+
+    def acknowledge(self, tick):
+        if tick not in self.sent or (self.ack is not None and tick <= self.ack):
+            return
+        self.ack = tick
+        # Bases older than the ack are never needed again
+        ticks = self.ticks
+        while ticks[0] < tick:
+            del self.sent[ticks.popleft()]
+
+    def encode(self, state, seat, scoreboard):
+        # Snapshot of a SharedState for the player in `seat`
+        base = self.sent.get(self.ack)
+        snakes = state.snakes
+        pools = (state.invaders, state.powerups, state.bullets)
+        current = tuple((pool.spawned, {entity.uid for entity in pool}) for pool in pools)
+
+        flags = GAME_OVER if state.seats[seat].out else 0
+        if base is None:
+            flags |= FULL
+        strawberry = state.strawberry.position
+        out = [SNAPSHOT_HEADER.pack(
+            state.tick, state.level, flags,
+            -1 if strawberry is None else strawberry[1] * state.width + strawberry[0], len(snakes))]
+        for index, snake in enumerate(snakes):
+            snake_flags = ((SHIELD if snake.shield_active else 0) | (SPEED if snake.speed_boost > 0 else 0) |
+                           (CAN_SHOOT if snake.can_shoot else 0))
+            if base is None or index >= len(base[0]):
+                snake_flags |= FULL
+                n_heads = snake.size
+            else:
+                n_heads = min(snake.moves - base[0][index], snake.size)
+            out.append(SNAKE_HEADER.pack(snake.moves, snake.size, n_heads, DIRECTION_CODES[snake.direction],
+                                         snake_flags))
+            body = snake.body
+            capacity = snake.capacity
+            start = snake.head_index
+            out.append(_uids(body[(start + i) % capacity] for i in range(n_heads - 1, -1, -1)))
+
+        for i, pool in enumerate(pools):
+            spawned, live = current[i]
+            if base is None:
+                known, old = 0, set()
+            else:
+                known, old = base[1][i]
+            gone = old - live
+            new = [entity for entity in pool if entity.uid not in old]
+            out.append(ENTITY_HEADER.pack(known, len(gone), len(new)))
+            out.append(_uids(gone))
+            if pool is state.invaders:
+                out.extend(INVADER_RECORD.pack(e.uid, e.grid_x, e.grid_y, e.speed) for e in new)
+            elif pool is state.powerups:
+                out.extend(POWERUP_RECORD.pack(e.uid, e.grid_x, POWERUP_CODES[e.type], e.grid_y)
+                           for e in new)
+            else:
+                out.extend(BULLET_RECORD.pack(e.uid, e.x, e.y, e.direction) for e in new)
+
+        out.append(bytes([len(scoreboard)]))
+        out.extend(SCORE.pack(score, status) for score, status in scoreboard)
+
+        self.sent[state.tick] = (tuple(snake.moves for snake in snakes), current)
+        self.ticks.append(state.tick)
+        if len(self.ticks) > self.limit:
+            dropped = self.ticks.popleft()
+            del self.sent[dropped]
+            if dropped == self.ack:
+                self.ack = None
+        return b"".join(out)
+
+class Mirror:
+    # Client side: a GameState rebuilt from snapshots, which the ordinary
+    # renderers can draw. Nothing is simulated here except the constant
+    # motion of invaders, powerups and bullets between their spawn and
+    # despawn. state.snakes holds every seat's snake and state.snake the
+    # player's own, once the server has sent it.
+    def __init__(self, seed, width, height, seat=0):
+        self.state = GameState(width, height, seed=seed)
+        self.state.strawberry.position = None
+        self.state.snakes = []
+        self.seat = seat
+        self.entities = ({}, {}, {})  # uid -> entity, for each pool
+        self.scoreboard = []  # (score, status) per seat in the room
+        self.tick = 0
+
+    def apply(self, payload):
+        # Update from a snapshot; returns its tick
+        state = self.state
+        tick, state.level, flags, strawberry, n_snakes = SNAPSHOT_HEADER.unpack_from(payload)
+        pos = SNAPSHOT_HEADER.size
+        snakes = state.snakes
+        for i in range(n_snakes):
+            moves, size, n_heads, direction, snake_flags = SNAKE_HEADER.unpack_from(payload, pos)
+            heads, pos = _read_uids(payload, pos + SNAKE_HEADER.size, n_heads)
+            if i == len(snakes):
+                snakes.append(Snake(state.width, state.height))
+                _clear_body(snakes[i])
+            snake = snakes[i]
+            if snake_flags & FULL or moves - snake.moves > len(heads):
+                _clear_body(snake)
+                missing = len(heads)
+            else:
+                missing = moves - snake.moves
+            for cell in heads[len(heads) - missing:]:
+                _push_head(snake, cell)
+            snake.moves = moves
+            while snake.size > size:
+                snake.occupancy[snake.tail_cell()] -= 1
+                snake.size -= 1
+            snake.direction = CODE_DIRECTIONS[direction]
+            snake.shield_active = bool(snake_flags & SHIELD)
+            snake.speed_boost = 1 if snake_flags & SPEED else 0
+            snake.can_shoot = bool(snake_flags & CAN_SHOOT)
+        if self.seat < len(snakes):
+            state.snake = snakes[self.seat]
+        state.game_over = bool(flags & GAME_OVER)
+        state.strawberry.position = (None if strawberry < 0 else
+                                     (strawberry % state.width, strawberry // state.width))
+
+        # Bring what we have up to this tick, then apply the changes
+        for _ in range(0 if flags & FULL else tick - self.tick):
+            for invader in state.invaders:
+                invader.move()
+            for powerup in state.powerups:
+                powerup.move()
+            for bullet in state.bullets:
+                bullet.move(state.pixel_height)
+        self.tick = state.tick = tick
+
+        for pool, entities in zip((state.invaders, state.powerups, state.bullets), self.entities):
+            known, n_gone, n_new = ENTITY_HEADER.unpack_from(payload, pos)
+            pos += ENTITY_HEADER.size
+            gone, pos = _read_uids(payload, pos, n_gone)
+            if flags & FULL:
+                gone = list(entities)
+            for uid in gone:
+                entity = entities.pop(uid, None)
+                if entity is not None:
+                    pool.remove(entity)
+            new = {}
+            for _ in range(n_new):
+                if pool is state.invaders:
+                    uid, x, y, speed = INVADER_RECORD.unpack_from(payload, pos)
+                    pos += INVADER_RECORD.size
+                    entity = entities.get(uid) or pool.spawn(state.width, state.height)
+                    entity.speed = speed
+                    entity.grid_x, entity.grid_y, entity.prev_y = x, y, y
+                    entity.cell = int(y) * state.width + x
+                elif pool is state.powerups:
+                    uid, x, code, y = POWERUP_RECORD.unpack_from(payload, pos)
+                    pos += POWERUP_RECORD.size
+                    entity = entities.get(uid) or pool.spawn(CODE_POWERUPS[code], state.width, state.height)
+                    entity.grid_x, entity.grid_y, entity.prev_y = x, y, y
+                    entity.cell = int(y) * state.width + x
+                else:
+                    uid, x, y, direction = BULLET_RECORD.unpack_from(payload, pos)
+                    pos += BULLET_RECORD.size
+                    entity = entities.get(uid) or pool.spawn((x, y), direction)
+                    entity.x, entity.y, entity.prev_y = x, y, y
+                new[uid] = entity
+            # Spawned after the base and gone again before this snapshot
+            for uid in [uid for uid in entities if uid >= known and uid not in new]:
+                pool.remove(entities.pop(uid))
+            entities.update(new)
+
+        count = payload[pos]
+        pos += 1
+        self.scoreboard = [SCORE.unpack_from(payload, pos + i * SCORE.size) for i in range(count)]
+        if self.seat < count:
+            state.score = self.scoreboard[self.seat][0]
+        return tick
+
+def _clear_body(snake):
+    snake.occupancy[:] = bytes(snake.capacity)
+    snake.size = 0
+
+def _push_head(snake, cell):
+    snake.head_index = (snake.head_index - 1) % snake.capacity
+    snake.body[snake.head_index] = cell
+    snake.occupancy[cell] += 1
+    snake.head_cell = cell
+    snake.size += 1
@@ -0,0 +1,63 @@
+# Storage for the short-lived entities of a game (invaders, powerups,
+# bullets). Spawning and despawning them is frequent, so removed entities
+# are kept and reused instead of being garbage collected.
+
+class EntityPool:
+    # Live entities are packed at the front of `items` and each one knows
+    # its `slot` there, so remove() moves the last live entity into the hole
+    # instead of shifting the list (O(1), but order is not preserved).
+    # Removed entities go on a free list and spawn() re-initialises one of
+    # them with reset(*args) rather than allocating a new object. Entities
+    # keep their identity while alive, so they can be used as dict keys.
+    # Each spawn also gets a `uid` never reused by the pool, which tells
+    # a reused object apart from the entity it was before (netcode.py).
+    def __init__(self, cls):
+        self.cls = cls
+        self.items = []
+        self.free = []
+        self.spawned = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __getitem__(self, i):
+        return self.items[i]
+
+    def spawn(self, *args):
+        if self.free:
+            entity = self.free.pop()
+        else:
+            entity = self.cls.__new__(self.cls)
+        entity.reset(*args)
+        entity.uid = self.spawned
+        self.spawned += 1
+        entity.slot = len(self.items)
+        self.items.append(entity)
+        return entity
+
+    def restore(self, uid):
+        # Slot for a saved entity (savestate.py): like spawn(), but the
+        # caller sets every attribute itself and the uid is the saved one
+        entity = self.free.pop() if self.free else self.cls.__new__(self.cls)
+        entity.uid = uid
+        entity.slot = len(self.items)
+        self.items.append(entity)
+        return entity
+
+    def remove(self, entity):
+        items = self.items
+        last = items.pop()
+        if last is not entity:
+            items[entity.slot] = last
+            last.slot = entity.slot
+        entity.slot = -1
+        self.free.append(entity)
+
+    def clear(self):
+        for entity in self.items:
+            entity.slot = -1
+        self.free.extend(self.items)
+        self.items.clear()
@@ -0,0 +1,223 @@
+import csv
+import json
+import math
+from collections import deque
+from time import perf_counter
+
+# Lightweight timing instrumentation for the front-end. Nothing in here
+# depends on pygame; samples are plain durations in seconds.
+
+class Histogram:
+    # Counts of durations in power-of-two buckets: bucket 0 is under `unit`
+    # seconds, bucket i covers [unit * 2**(i-1), unit * 2**i) and the last
+    # bucket is open-ended. Recording is O(1) and memory does not grow.
+    def __init__(self, n_buckets=12, unit=0.001):
+        self.unit = unit
+        self.counts = [0] * n_buckets
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        x = seconds / self.unit
+        if x < 1.0:
+            i = 0
+        else:
+            i = min(int(math.log2(x)) + 1, len(self.counts) - 1)
+        self.counts[i] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def clear(self):
+        self.counts = [0] * len(self.counts)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def edge(self, i):
+        # Upper edge of bucket i in seconds
+        return self.unit * 2 ** i
+
+    def bucket_label(self, i):
+        if i == 0:
+            return f"<{self.edge(0) * 1000:g}ms"
+        if i == len(self.counts) - 1:
+            return f">={self.edge(i - 1) * 1000:g}ms"
+        return f"{self.edge(i - 1) * 1000:g}-{self.edge(i) * 1000:g}ms"
+
+    def percentile(self, p):
+        # Upper bound in seconds of the bucket holding the p-th percentile
+        # (the observed maximum for the open-ended bucket)
+        if not self.count:
+            return 0.0
+        rank = p / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                if i == len(self.counts) - 1:
+                    return self.max
+                return min(self.edge(i), self.max)
+        return self.max
+
+    def report(self, title):
+        lines = [f"{title}: n={self.count} mean={self.mean() * 1000:.1f}ms "
+                 f"p50<={self.percentile(50) * 1000:.1f}ms "
+                 f"p95<={self.percentile(95) * 1000:.1f}ms "
+                 f"max={self.max * 1000:.1f}ms"]
+        for i, n in enumerate(self.counts):
+            if n:
+                lines.append(f"  {self.bucket_label(i):>16} {n}")
+        return "\n".join(lines)
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.mean() * 1000,
+            "p50_ms": self.percentile(50) * 1000,
+            "p95_ms": self.percentile(95) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "max_ms": self.max * 1000,
+            "buckets": {self.bucket_label(i): n for i, n in enumerate(self.counts) if n},
+        }
+
+class StartupTrace:
+    # Time to the first frame, split into named stages: mark(name) ends the
+    # stage `name` at the current time. `start` defaults to now; pass an
+    # earlier perf_counter() reading to include what came before.
+    def __init__(self, start=None):
+        self.start = perf_counter() if start is None else start
+        self.stages = []  # (name, seconds since start at its end)
+
+    def mark(self, name):
+        self.stages.append((name, perf_counter() - self.start))
+
+    def report(self, title="Startup"):
+        lines = [f"{title}:"]
+        previous = 0.0
+        for name, at in self.stages:
+            lines.append(f"  {name:<20} {(at - previous) * 1000:8.1f}ms  (at {at * 1000:.1f}ms)")
+            previous = at
+        return "\n".join(lines)
+
+class FrameProfiler:
+    # Splits every frame into named phases. lap(name) charges the time since
+    # the previous lap (or begin_frame) to `name`; a phase lapped several
+    # times in one frame, such as once per simulation tick, adds up. Each
+    # phase keeps a histogram over the whole run and its last `window`
+    # frames for rolling percentiles. With record=True every frame is also
+    # kept for export_csv/export_json. Phase histograms start at 1/64 ms.
+    def __init__(self, window=120, record=False, phases=()):
+        self.window = window
+        self.record = record
+        self.phases = []  # Phase names, `phases` first, then in order seen
+        self.histograms = {}
+        self.recent = {}
+        for name in phases:
+            self._add_phase(name)
+        self.frame_histogram = Histogram(20, 1 / 64000.0)
+        self.recent_frames = deque(maxlen=window)
+        self.counts = {}
+        self.frames = []  # (start, total, per-phase seconds, counts) per frame
+        self._current = {}
+        self._start = self._last = perf_counter()
+
+    def begin_frame(self):
+        self._start = self._last = perf_counter()
+        self._current = {}
+
+    def lap(self, name):
+        now = perf_counter()
+        current = self._current
+        current[name] = current.get(name, 0.0) + now - self._last
+        self._last = now
+
+    def count(self, name, value):
+        # Gauge (entity count etc.) reported alongside the timings
+        self.counts[name] = value
+
+    def end_frame(self):
+        self.lap("other")  # Whatever ran after the last lap
+        total = self._last - self._start
+        current = self._current
+        for name in current:
+            if name not in self.histograms:
+                self._add_phase(name)
+        times = [current.get(name, 0.0) for name in self.phases]
+        for name, seconds in zip(self.phases, times):
+            self.histograms[name].record(seconds)
+            self.recent[name].append(seconds)
+        self.frame_histogram.record(total)
+        self.recent_frames.append(total)
+        if self.record:
+            self.frames.append((self._start, total, times, dict(self.counts)))
+
+    def _add_phase(self, name):
+        self.phases.append(name)
+        self.histograms[name] = Histogram(20, 1 / 64000.0)
+        self.recent[name] = deque(maxlen=self.window)
+
+    def rolling(self, name, p):
+        # p-th percentile in seconds of a phase (or "frame") over the window
+        samples = self.recent_frames if name == "frame" else self.recent.get(name)
+        if not samples:
+            return 0.0
+        ordered = sorted(samples)
+        return ordered[min(int(p / 100.0 * len(ordered)), len(ordered) - 1)]
+
+    def fps(self):
+        if not self.recent_frames:
+            return 0.0
+        return len(self.recent_frames) / max(sum(self.recent_frames), 1e-9)
+
+    def report(self):
+        # One line per phase; percentiles are bucket upper bounds
+        lines = [f"{'phase':<18}{'frames':>8}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}"]
+        rows = [("frame", self.frame_histogram)]
+        rows += [(name, self.histograms[name]) for name in self.phases]
+        for name, histogram in rows:
+            lines.append(f"{name:<18}{histogram.count:>8}{histogram.mean() * 1000:>10.3f}"
+                         f"{histogram.percentile(50) * 1000:>10.3f}"
+                         f"{histogram.percentile(95) * 1000:>10.3f}{histogram.max * 1000:>10.3f}")
+        return "\n".join(lines)
+
+    def export_csv(self, path):
+        count_names = sorted({name for frame in self.frames for name in frame[3]})
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame", "start", "total_ms"] +
+                            [name + "_ms" for name in self.phases] + count_names)
+            origin = self.frames[0][0] if self.frames else 0.0
+            n_phases = len(self.phases)
+            for i, (start, total, times, counts) in enumerate(self.frames):
+                # Phases first seen later are zero in earlier frames
+                times = times + [0.0] * (n_phases - len(times))
+                writer.writerow([i, f"{start - origin:.6f}", f"{total * 1000:.4f}"] +
+                                [f"{t * 1000:.4f}" for t in times] +
+                                [counts.get(name, "") for name in count_names])
+
+    def export_json(self, path):
+        data = {
+            "frame": self.frame_histogram.to_dict(),
+            "phases": {name: self.histograms[name].to_dict() for name in self.phases},
+            "frames": [
+                {"start": start, "total_ms": total * 1000,
+                 "phases_ms": {name: t * 1000 for name, t in zip(self.phases, times)},
+                 "counts": counts}
+                for start, total, times, counts in self.frames
+            ],
+        }
+        with open(path, "w") as f:
+            json.dump(data, f)
+
+    def export(self, path):
+        # JSON for a .json path, CSV otherwise
+        if path.endswith(".json"):
+            self.export_json(path)
+        else:
+            self.export_csv(path)
@@ -0,0 +1,473 @@
+import pygame
+
+from assets import AssetCache, TextCache
+from game_core import SCREEN_WIDTH, SCREEN_HEIGHT, GRID_SIZE, Direction, PowerUpType
+
+# Colors
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+GREEN = (0, 255, 0)
+RED = (255, 0, 0)
+BLUE = (0, 0, 255)
+YELLOW = (255, 255, 0)
+PURPLE = (128, 0, 128)
+CYAN = (0, 255, 255)
+
+BULLET_SIZE = (4, 10)
+
+POWERUP_IMAGES = {
+    PowerUpType.SPEED: "speed_powerup",
+    PowerUpType.SHIELD: "shield_powerup",
+    PowerUpType.BULLET: "bullet_powerup",
+}
+
+SPRITES = ("snake_body", "strawberry", "invader") + tuple(POWERUP_IMAGES.values())
+
+# Powerup indicators along the top of the screen: text, x offset from center, color
+INDICATORS = (
+    ("SPEED!", -100, BLUE),
+    ("SHIELD!", 0, CYAN),
+    ("BULLETS!", 100, YELLOW),
+)
+
+def indicator_flags(snake):
+    return (snake.speed_boost > 0, snake.shield_active, snake.can_shoot)
+
+# Shared by every screen; fonts are only created once pygame.font is up
+text_cache = TextCache()
+
+def lerp(a, b, t):
+    return a + (b - a) * t
+
+def draw_grid(surface):
+    for y in range(0, SCREEN_HEIGHT, GRID_SIZE):
+        for x in range(0, SCREEN_WIDTH, GRID_SIZE):
+            rect = pygame.Rect((x, y), (GRID_SIZE, GRID_SIZE))
+            pygame.draw.rect(surface, (40, 40, 40), rect, 1)
+
+def blit_midtop(surface, text_surface, x, y):
+    text_rect = text_surface.get_rect()
+    text_rect.midtop = (x, y)
+    surface.blit(text_surface, text_rect)
+
+def draw_text(surface, text, size, x, y, color=WHITE):
+    blit_midtop(surface, text_cache.render(text, size, color), x, y)
+
+# Maps board pixels to screen pixels. The board wraps around, and so does
+# the view: on a board bigger than the window the camera keeps the snake's
+# head in the middle and shows whatever is past the edge of the board from
+# the other side. A board that fits in the window is shown whole and still.
+class Camera:
+    def __init__(self, view_width, view_height):
+        self.view_width = view_width
+        self.view_height = view_height
+        self.world_width = view_width
+        self.world_height = view_height
+        self.x = 0  # Board pixel at the top-left corner of the screen
+        self.y = 0
+        self.scrolls = False
+
+    def follow(self, state):
+        self.world_width = state.width * GRID_SIZE
+        self.world_height = state.height * GRID_SIZE
+        head_x, head_y = state.snake.get_head_position()
+        self.x = self.y = 0
+        if self.world_width > self.view_width:
+            self.x = (head_x * GRID_SIZE + GRID_SIZE // 2 - self.view_width // 2) % self.world_width
+        if self.world_height > self.view_height:
+            self.y = (head_y * GRID_SIZE + GRID_SIZE // 2 - self.view_height // 2) % self.world_height
+        self.scrolls = self.world_width > self.view_width or self.world_height > self.view_height
+
+    def to_screen(self, x, y, w, h):
+        # Screen position of a w x h board rect, or None if none of it shows
+        if self.world_width > self.view_width:
+            x = (x - self.x) % self.world_width
+            if x > self.world_width - w:
+                x -= self.world_width  # Straddles the left edge of the screen
+            if x >= self.view_width:
+                return None
+        if self.world_height > self.view_height:
+            y = (y - self.y) % self.world_height
+            if y > self.world_height - h:
+                y -= self.world_height
+            if y >= self.view_height:
+                return None
+        return (x, y)
+
+    def _axis(self, offset, view, cells):
+        # (cell index, screen pixel) for the cells on screen along one axis
+        if cells * GRID_SIZE <= view:
+            return [(i, i * GRID_SIZE) for i in range(cells)]
+        first = offset // GRID_SIZE
+        shift = offset % GRID_SIZE
+        count = min((view + shift - 1) // GRID_SIZE + 1, cells)
+        return [((first + i) % cells, i * GRID_SIZE - shift) for i in range(count)]
+
+    def visible_cells(self, width, height):
+        # Number of board cells at least partly on screen
+        return (len(self._axis(self.x, self.view_width, width)) *
+                len(self._axis(self.y, self.view_height, height)))
+
+    def rows_and_columns(self, width, height):
+        return (self._axis(self.y, self.view_height, height),
+                self._axis(self.x, self.view_width, width))
+
+# Draws a GameState; owns every pygame resource the simulation doesn't need.
+# Redraws the whole screen each frame and presents it with a flip. Only
+# what the camera can see is drawn, so a huge board costs no more to draw
+# than a small one.
+class GameRenderer:
+    def __init__(self, surface, assets=None, camera=None):
+        self.surface = surface
+        self.assets = assets if assets is not None else AssetCache()
+        self.assets.preload(SPRITES)
+        self.camera = camera if camera is not None else Camera(*surface.get_size())
+        self.profiler = None  # Optional profiling.FrameProfiler
+
+    def draw_body(self, snake, image="snake_body"):
+        surface = self.surface
+        camera = self.camera
+        width = snake.width
+        body_image = self.assets.image(image)
+        head_cell = snake.head_cell
+        if snake.size <= camera.visible_cells(width, snake.height):
+            # Short snake: cull its segments
+            for cell in snake.cells():
+                if cell != head_cell:
+                    pos = camera.to_screen((cell % width) * GRID_SIZE, (cell // width) * GRID_SIZE,
+                                           GRID_SIZE, GRID_SIZE)
+                    if pos is not None:
+                        surface.blit(body_image, pos)
+            return
+
+        # Long snake: look up the cells on screen instead
+        occupancy = snake.occupancy
+        rows, columns = camera.rows_and_columns(width, snake.height)
+        for row, y in rows:
+            base = row * width
+            for column, x in columns:
+                cell = base + column
+                if occupancy[cell] and cell != head_cell:
+                    surface.blit(body_image, (x, y))
+
+    def draw_head(self, snake, image="snake_head"):
+        surface = self.surface
+        # Head sprites come with the eyes already drawn for each direction
+        head = snake.get_head_position()
+        pos = self.camera.to_screen(head[0] * GRID_SIZE, head[1] * GRID_SIZE, GRID_SIZE, GRID_SIZE)
+        if pos is None:
+            return
+        surface.blit(self.assets.head(snake.direction, image), pos)
+
+        # Draw shield if active
+        if snake.shield_active:
+            surface.blit(self.assets.shield(), (pos[0] - 2, pos[1] - 2))
+
+    def draw_sprite(self, image, x, y):
+        # Blit at board pixel (x, y) unless it is off screen
+        pos = self.camera.to_screen(x, y, image.get_width(), image.get_height())
+        if pos is not None:
+            self.surface.blit(image, pos)
+
+    def draw_cell(self, image, x, y):
+        self.draw_sprite(image, x * GRID_SIZE, int(y) * GRID_SIZE)
+
+    def draw(self, state, alpha=1.0):
+        # alpha is how far the display is between the last two simulation
+        # ticks; invaders, powerups and bullets are drawn interpolated
+        surface = self.surface
+        surface.fill(BLACK)
+        self.camera.follow(state)
+        # draw_grid(surface)  # Optional, for debugging
+
+        # Bodies go underneath everything else, heads on top. On a shared
+        # board the other players' snakes are drawn in their own color, and
+        # a snake that is out (size 0) not at all.
+        for snake in state.snakes:
+            if snake.size:
+                self.draw_body(snake, "snake_body" if snake is state.snake else "rival_body")
+
+        strawberry = state.strawberry.position
+        if strawberry is not None:
+            self.draw_cell(self.assets.image("strawberry"), strawberry[0], strawberry[1])
+
+        draw_sprite = self.draw_sprite
+        invader_image = self.assets.image("invader")
+        for invader in state.invaders:
+            draw_sprite(invader_image, invader.grid_x * GRID_SIZE,
+                        int(lerp(invader.prev_y, invader.grid_y, alpha) * GRID_SIZE))
+
+        for powerup in state.powerups:
+            draw_sprite(self.assets.image(POWERUP_IMAGES[powerup.type]),
+                        powerup.grid_x * GRID_SIZE, int(lerp(powerup.prev_y, powerup.grid_y, alpha) * GRID_SIZE))
+
+        bullet_image = self.assets.image("bullet", BULLET_SIZE)
+        for bullet in state.bullets:
+            draw_sprite(bullet_image, bullet.x - bullet.width // 2,
+                        int(lerp(bullet.prev_y, bullet.y, alpha)) - bullet.height // 2)
+
+        for snake in state.snakes:
+            if snake.size:
+                self.draw_head(snake, "snake_head" if snake is state.snake else "rival_head")
+        if self.profiler:
+            self.profiler.lap("draw")
+
+        # Draw UI
+        blit_midtop(surface, text_cache.render_value("score", "Score: {}", state.score, 24, WHITE), 100, 10)
+        blit_midtop(surface, text_cache.render_value("level", "Level: {}", state.level, 24, WHITE),
+                    SCREEN_WIDTH - 100, 10)
+
+        # Draw powerup indicators
+        for (text, offset, color), active in zip(INDICATORS, indicator_flags(state.snake)):
+            if active:
+                draw_text(surface, text, 20, SCREEN_WIDTH // 2 + offset, 10, color)
+        if self.profiler:
+            self.profiler.lap("hud")
+
+    def invalidate(self):
+        # Something else drew over the screen; nothing to do for a full redraw
+        pass
+
+    def mark_dirty(self, rect):
+        # Something else drew into rect this frame; the flip shows it anyway
+        pass
+
+    def present(self):
+        pygame.display.flip()
+
+class CellSprite(pygame.sprite.DirtySprite):
+    def __init__(self, image, layer):
+        pygame.sprite.DirtySprite.__init__(self)
+        self.image = image
+        self.rect = image.get_rect()
+        self._layer = layer
+
+    def place(self, image, x, y):
+        # Only mark the sprite dirty when it actually changed
+        if image is not self.image or x != self.rect.x or y != self.rect.y:
+            if image.get_size() != self.rect.size:
+                self.rect.size = image.get_size()
+            self.image = image
+            self.rect.topleft = (x, y)
+            self.dirty = 1
+
+    def show(self, visible):
+        if visible != self.visible:
+            self.visible = visible
+
+def coalesce_rects(rects):
+    # Merge overlapping rects in place. LayeredDirty already does this for
+    # moving sprites, but not for repainted areas or removed sprites, and
+    # an area listed twice gets the antialiased HUD text blended in twice.
+    merged = []
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        i = rect.collidelist(merged)
+        while i > -1:
+            rect.union_ip(merged[i])
+            del merged[i]
+            i = rect.collidelist(merged)
+        merged.append(rect)
+    rects[:] = merged
+
+# Layers, bottom to top. The snake body is not a sprite: it is painted into
+# the background surface cell by cell as the snake moves, so a long snake
+# costs nothing on frames where it only gained a head and lost a tail.
+STRAWBERRY_LAYER, INVADER_LAYER, POWERUP_LAYER, BULLET_LAYER, HEAD_LAYER, SHIELD_LAYER, HUD_LAYER = range(7)
+
+# Redraws and presents only the parts of the screen that changed. While
+# the camera scrolls everything on screen moves, so it draws and presents
+# whole frames like GameRenderer instead. It does the same on a board
+# shared by several snakes, since it only keeps track of one snake's body.
+class DirtyRenderer(GameRenderer):
+    def __init__(self, surface, assets=None, camera=None):
+        GameRenderer.__init__(self, surface, assets, camera)
+        self.background = pygame.Surface(surface.get_size()).convert()
+        self.group = pygame.sprite.LayeredDirty()
+        self.group.clear(surface, self.background)
+        self.rects = []
+        self._state = None
+        self._sprites = {}  # Entity -> CellSprite
+
+        self.strawberry = CellSprite(self.assets.image("strawberry"), STRAWBERRY_LAYER)
+        self.head = CellSprite(self.assets.head(Direction.RIGHT), HEAD_LAYER)
+        self.shield = CellSprite(self.assets.shield(), SHIELD_LAYER)
+        self.score = CellSprite(text_cache.render_value("score", "Score: {}", 0, 24, WHITE), HUD_LAYER)
+        self.level = CellSprite(text_cache.render_value("level", "Level: {}", 1, 24, WHITE), HUD_LAYER)
+        self.indicators = [CellSprite(text_cache.render(text, 20, color), HUD_LAYER)
+                           for text, offset, color in INDICATORS]
+        self.group.add(self.strawberry, self.head, self.shield, self.score, self.level, *self.indicators)
+
+    def invalidate(self):
+        self._state = None
+
+    def draw(self, state, alpha=1.0):
+        self.camera.follow(state)
+        if self.camera.scrolls or len(state.snakes) > 1:
+            GameRenderer.draw(self, state, alpha)
+            self.rects = [self.surface.get_rect()]
+            self._state = None
+            return
+
+        if state is not self._state:
+            self._rebuild(state)
+        else:
+            self._sync_body(state.snake)
+
+        assets = self.assets
+        snake = state.snake
+        head = snake.get_head_position()
+        self.head.place(assets.head(snake.direction), head[0] * GRID_SIZE, head[1] * GRID_SIZE)
+        self.shield.place(assets.shield(), head[0] * GRID_SIZE - 2, head[1] * GRID_SIZE - 2)
+        self.shield.show(snake.shield_active)
+
+        strawberry = state.strawberry.position
+        if strawberry is not None:
+            self.strawberry.place(self.strawberry.image, strawberry[0] * GRID_SIZE, strawberry[1] * GRID_SIZE)
+        self.strawberry.show(strawberry is not None)
+
+        seen = set()
+        invader_image = assets.image("invader")
+        for invader in state.invaders:
+            self._place(invader, invader_image, INVADER_LAYER, invader.grid_x * GRID_SIZE,
+                        int(lerp(invader.prev_y, invader.grid_y, alpha) * GRID_SIZE), seen)
+        for powerup in state.powerups:
+            self._place(powerup, assets.image(POWERUP_IMAGES[powerup.type]), POWERUP_LAYER,
+                        powerup.grid_x * GRID_SIZE, int(lerp(powerup.prev_y, powerup.grid_y, alpha) * GRID_SIZE),
+                        seen)
+        bullet_image = assets.image("bullet", BULLET_SIZE)
+        for bullet in state.bullets:
+            self._place(bullet, bullet_image, BULLET_LAYER, bullet.x - bullet.width // 2,
+                        int(lerp(bullet.prev_y, bullet.y, alpha)) - bullet.height // 2, seen)
+        if len(seen) != len(self._sprites):
+            for entity in [e for e in self._sprites if e not in seen]:
+                self.group.remove(self._sprites.pop(entity))
+        profiler = self.profiler
+        if profiler:
+            profiler.lap("draw")
+
+        self._sync_hud(state)
+        if profiler:
+            profiler.lap("hud")
+        coalesce_rects(self.group.lostsprites)
+        self.rects = self.group.draw(self.surface)
+        if profiler:
+            profiler.lap("draw")
+
+    def mark_dirty(self, rect):
+        self.rects.append(rect)
+
+    def present(self):
+        pygame.display.update(self.rects)
+
+    def _place(self, entity, image, layer, x, y, seen):
+        seen.add(entity)
+        sprite = self._sprites.get(entity)
+        if sprite is None:
+            sprite = CellSprite(image, layer)
+            sprite.rect.topleft = (x, y)
+            self._sprites[entity] = sprite
+            self.group.add(sprite)
+        else:
+            sprite.place(image, x, y)
+
+    def _sync_hud(self, state):
+        score = text_cache.render_value("score", "Score: {}", state.score, 24, WHITE)
+        level = text_cache.render_value("level", "Level: {}", state.level, 24, WHITE)
+        self.score.place(score, 100 - score.get_width() // 2, 10)
+        self.level.place(level, SCREEN_WIDTH - 100 - level.get_width() // 2, 10)
+        for sprite, (text, offset, color), active in zip(self.indicators, INDICATORS,
+                                                         indicator_flags(state.snake)):
+            sprite.place(sprite.image, SCREEN_WIDTH // 2 + offset - sprite.image.get_width() // 2, 10)
+            sprite.show(active)
+
+    def _paint_cell(self, cell, width, image):
+        rect = (cell % width * GRID_SIZE, cell // width * GRID_SIZE, GRID_SIZE, GRID_SIZE)
+        if image is None:
+            self.background.fill(BLACK, rect)
+        else:
+            self.background.blit(image, rect)
+        self.group.repaint_rect(rect)
+
+    def _rebuild(self, state):
+        # Full repaint: new game, or something else drew over the screen
+        snake = state.snake
+        body_image = self.assets.image("snake_body")
+        width = snake.width
+        self.background.fill(BLACK)
+        head_cell = snake.head_cell
+        for cell in snake.cells():
+            if cell != head_cell:
+                self.background.blit(body_image, (cell % width * GRID_SIZE, cell // width * GRID_SIZE))
+        self.group.repaint_rect(self.surface.get_rect())
+        self._state = state
+        self._moves = snake.moves
+        self._size = snake.size
+
+    def _sync_body(self, snake):
+        # Repaint only the cells that changed since the last frame: the
+        # segments pushed at the front and the ones dropped off the tail.
+        # Both can be read back from the ring buffer unless it has wrapped
+        # over the old tail, in which case we fall back to a full rebuild.
+        pushed = snake.moves - self._moves
+        if not pushed:
+            return
+        dropped = self._size + pushed - snake.size
+        if self._size + pushed > snake.capacity or pushed > snake.size:
+            self._rebuild(self._state)
+            return
+
+        body = snake.body
+        capacity = snake.capacity
+        width = snake.width
+        start = snake.head_index
+        for i in range(snake.size, snake.size + dropped):
+            self._paint_cell(body[(start + i) % capacity], width, None)
+        body_image = self.assets.image("snake_body")
+        for i in range(1, min(pushed + 1, snake.size)):
+            self._paint_cell(body[(start + i) % capacity], width, body_image)
+        self._moves = snake.moves
+        self._size = snake.size
+
+# Debug overlay (F3) with rolling per-phase timings from a FrameProfiler.
+# The text is only re-rendered every `refresh` frames to keep its own cost
+# out of the numbers it shows.
+class ProfileOverlay:
+    def __init__(self, profiler, refresh=15, size=18):
+        self.profiler = profiler
+        self.refresh = refresh
+        self.size = size
+        self.image = None
+        self._frames = 0
+
+    def draw(self, surface, x=5, y=40):
+        # Returns the rect drawn over
+        if self.image is None or self._frames % self.refresh == 0:
+            self.image = self._render()
+        self._frames += 1
+        return surface.blit(self.image, (x, y))
+
+    def _render(self):
+        # Two columns: phase name, then p50/p95 over the profiler's window
+        profiler = self.profiler
+        rows = [(f"{profiler.fps():.1f} fps", "p50 / p95 ms"),
+                ("frame", f"{profiler.rolling('frame', 50) * 1000:.2f} / "
+                          f"{profiler.rolling('frame', 95) * 1000:.2f}")]
+        for name in profiler.phases:
+            rows.append((name, f"{profiler.rolling(name, 50) * 1000:.2f} / "
+                               f"{profiler.rolling(name, 95) * 1000:.2f}"))
+        for name, value in profiler.counts.items():
+            rows.append((name, str(value)))
+
+        font = text_cache.font(self.size)
+        rendered = [(font.render(left, True, WHITE), font.render(right, True, WHITE))
+                    for left, right in rows]
+        column = max(left.get_width() for left, right in rendered) + 12
+        line_height = font.get_linesize()
+        image = pygame.Surface((column + max(right.get_width() for left, right in rendered) + 8,
+                                line_height * len(rendered) + 8))
+        image.fill((20, 20, 20))
+        for i, (left, right) in enumerate(rendered):
+            image.blit(left, (4, 4 + i * line_height))
+            image.blit(right, (4 + column, 4 + i * line_height))
+        return image
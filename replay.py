@@ -0,0 +1,218 @@
+import argparse
+import hashlib
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from game_core import CODE_DIRECTIONS, DIRECTION_CODES, Action, GameState, NOOP, step
+
+# Replays store the seed and the player's input, nothing else; a game is
+# reproduced by running the simulation again. File layout:
+#   header   MAGIC, version (B), seed (Q), width (H), height (H)
+#   records  one per tick that had input: ticks without input before it
+#            (varint), flags (B: bit 7 = shoot, low 7 bits = number of
+#            turns), then the turns packed four 2-bit direction codes a byte
+#   trailer  ticks without input after the last record (varint), END,
+#            final tick (I), score (I), state digest (16 bytes)
+# Writing appends as the game runs, so an unfinished game (the window was
+# closed) can still be replayed, just not verified.
+
+MAGIC = b"CSRP"
+VERSION = 3  # 2: spawning and firing are scheduled; 3: invaders speed up with the level
+HEADER = struct.Struct("<4sBQHH")
+TRAILER = struct.Struct("<II16s")
+END = 0xFF
+SHOOT = 0x80
+MAX_TURNS = 0x7E  # Shoot plus 0x7F turns would read as END
+REPLAY_EXTENSION = ".replay"
+
+def state_digest(state):
+    # Hash of everything that can differ between two runs of a game,
+    # including the RNG, so any divergence shows up by the end
+    snake = state.snake
+    parts = (
+        state.tick, state.score, state.level, state.game_over, state.death_cause,
+        list(snake.cells()), snake.direction, snake.length, snake.growing,
+        snake.speed_boost, snake.shield_timer, snake.bullet_timer, snake.last_shot_time,
+        state.strawberry.position,
+        [(i.grid_x, i.grid_y, i.fire_tick) for i in state.invaders],
+        [(p.type, p.grid_x, p.grid_y) for p in state.powerups],
+        [(b.x, b.y, b.direction) for b in state.bullets],
+        state.invader_spawns.left, state.powerup_spawns.left,
+        state.rng.getstate(),
+    )
+    return hashlib.blake2b(repr(parts).encode(), digest_size=16).digest()
+
+def _varint(n):
+    out = bytearray()
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+    return out
+
+class ReplayWriter:
+    # Call record() with the action for every step of the game, then
+    # finish() once it is over
+    def __init__(self, path, state):
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, state.seed, state.width, state.height))
+        self.idle = 0  # Ticks without input since the last record
+
+    def record(self, action):
+        turns = action.turns
+        if not turns and not action.shoot:
+            self.idle += 1
+            return
+        if len(turns) > MAX_TURNS:
+            raise ValueError(f"too many turns in one tick: {len(turns)}")
+
+        out = _varint(self.idle)
+        out.append(len(turns) | (SHOOT if action.shoot else 0))
+        for i in range(0, len(turns), 4):
+            packed = 0
+            for j, (direction, stamp) in enumerate(turns[i:i + 4]):
+                packed |= DIRECTION_CODES[direction] << (2 * j)
+            out.append(packed)
+        self.file.write(out)
+        self.idle = 0
+
+    def finish(self, state):
+        out = _varint(self.idle)
+        out.append(END)
+        self.file.write(out)
+        self.file.write(TRAILER.pack(state.tick, state.score, state_digest(state)))
+        self.close()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+class Replay:
+    def __init__(self, data):
+        magic, version, self.seed, self.width, self.height = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("not a replay file")
+        if version != VERSION:
+            raise ValueError(f"unsupported replay version {version}")
+        self.data = data
+        self.final = None  # (tick, score, digest) from the trailer, if finished
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls(f.read())
+
+    def actions(self):
+        # One Action per recorded tick; sets self.final on reaching the
+        # trailer. A file cut off mid-record (a crash while recording) ends
+        # after the last whole record, as unfinished.
+        data = self.data
+        pos = HEADER.size
+        end = len(data)
+        while pos < end:
+            idle = shift = 0
+            while True:
+                if pos >= end:
+                    return
+                byte = data[pos]
+                pos += 1
+                idle |= (byte & 0x7F) << shift
+                shift += 7
+                if byte < 0x80:
+                    break
+            for _ in range(idle):
+                yield NOOP
+
+            if pos >= end:
+                return
+            flags = data[pos]
+            pos += 1
+            if flags == END:
+                if pos + TRAILER.size <= end:
+                    self.final = TRAILER.unpack_from(data, pos)
+                return
+
+            action = Action(shoot=bool(flags & SHOOT))
+            n_turns = flags & ~SHOOT
+            if pos + (n_turns + 3) // 4 > end:
+                return
+            for i in range(n_turns):
+                if i % 4 == 0:
+                    packed = data[pos]
+                    pos += 1
+                action.turn(CODE_DIRECTIONS[(packed >> (2 * (i % 4))) & 3])
+            yield action
+
+    def run(self):
+        # Re-simulate the whole game and return the final state
+        state = GameState(self.width, self.height, seed=self.seed)
+        for action in self.actions():
+            step(state, action)
+        return state
+
+def verify(path):
+    # (path, status, ticks) where status is "ok", "MISMATCH", "unfinished"
+    # or "invalid" (not a replay, or one of another version)
+    try:
+        replay = Replay.load(path)
+    except (ValueError, struct.error):
+        return path, "invalid", 0
+    state = replay.run()
+    if replay.final is None:
+        return path, "unfinished", state.tick
+    tick, score, digest = replay.final
+    if (state.tick, state.score, state_digest(state)) != (tick, score, digest):
+        return path, "MISMATCH", state.tick
+    return path, "ok", state.tick
+
+def find_replays(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith(REPLAY_EXTENSION):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Re-simulate recorded games headless and check their final state")
+    parser.add_argument("paths", nargs="+", help="replay files or directories of them")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="worker processes (default: 1, run in this process)")
+    parser.add_argument("--quiet", action="store_true", help="only report failures")
+    args = parser.parse_args(argv)
+
+    paths = list(find_replays(args.paths))
+    start = time.perf_counter()
+    if args.jobs > 1:
+        pool = ProcessPoolExecutor(args.jobs)
+        results = pool.map(verify, paths, chunksize=max(1, len(paths) // (args.jobs * 8)))
+    else:
+        pool = None
+        results = map(verify, paths)
+
+    counts = {"ok": 0, "MISMATCH": 0, "unfinished": 0, "invalid": 0}
+    ticks = 0
+    for path, status, n_ticks in results:
+        counts[status] += 1
+        ticks += n_ticks
+        if status != "ok" or not args.quiet:
+            print(f"{status:>10}  {path}  ({n_ticks} ticks)")
+    if pool is not None:
+        pool.shutdown()
+
+    elapsed = time.perf_counter() - start
+    print(f"{len(paths)} replays, {counts['ok']} ok, {counts['MISMATCH']} mismatched, "
+          f"{counts['unfinished']} unfinished, {counts['invalid']} invalid; {ticks} ticks in {elapsed:.2f}s "
+          f"({ticks / max(elapsed, 1e-9):.0f} ticks/s)")
+    return 1 if counts["MISMATCH"] or counts["invalid"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
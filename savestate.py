@@ -0,0 +1,285 @@
+import struct
+import zlib
+from collections import deque
+
+from game_core import CODE_DIRECTIONS, CODE_POWERUPS, DIRECTION_CODES, POWERUP_CODES, DeathCause, GameState
+
+# Save and restore a whole game mid-run: quick save/resume, rolling back
+# to an earlier tick, or trying moves out on a copy. A restored game
+# continues exactly as the original would, RNG included.
+#
+# A SaveState has two parts. `header` packs every scalar (game, snake,
+# strawberry), the spawn and fire schedules, the queued turns, each
+# invader, powerup and bullet, and the RNG state. `arrays` holds the
+# per-cell arrays (snake body and occupancy, free-cell index) as raw
+# bytes in CHUNK-sized pieces. A
+# tick changes only a few cells, so when a save is made with the
+# previous one at hand, every chunk that didn't change is the previous
+# save's bytes object, not a copy. A ring of the last N ticks therefore
+# costs about one header plus a few chunks per tick, not N boards.
+#
+# to_bytes() gives the same state as one buffer (arrays zlib-compressed)
+# for writing to disk; queued turns keep their direction but not their
+# input timestamp.
+
+MAGIC = b"CSSV"
+VERSION = 2
+CHUNK = 4096  # Bytes
+
+FILE_HEADER = struct.Struct("<4sBI")  # magic, version, header length
+GAME = struct.Struct("<QHHIdIIiBBddIddd4I")  # seed, width, height, tick, time, score,
+                                               # level, snake wait, game over, death cause,
+                                               # spawn rate, speed multiplier, max invaders,
+                                               # fire rate, level steps, uids handed out,
+                                               # free cells
+SCHEDULE = struct.Struct("<dqdqd")  # invader and powerup spawn countdowns (rate and trials
+                                    # left, -1 for none), fire rate the timers were drawn for
+SNAKE = struct.Struct("<IIIiIIiBBBiBiBiidB")  # size, head index, head cell, vacated, moves,
+                                               # length, strawberry, direction, turns, growing,
+                                               # speed boost, shield, shield timer, can shoot,
+                                               # bullet timer, shot cooldown, last shot time
+                                               # and whether it is a float (the initial one
+                                               # is an int, later ones are state.time)
+COUNTS = struct.Struct("<III")  # invaders, powerups, bullets
+INVADER = struct.Struct("<IIdddq")  # uid, column, row, previous row, speed, fire tick (-1 for none)
+POWERUP = struct.Struct("<IBIdddi")  # uid, type, column, row, previous row, speed, active time
+BULLET = struct.Struct("<Iiddbd")  # uid, x, y, previous y, direction, speed
+RNG = struct.Struct("<I625I")  # version, Mersenne Twister state and position
+
+CODE_DEATHS = [None] + list(DeathCause)
+DEATH_CODES = {cause: i for i, cause in enumerate(CODE_DEATHS)}
+
+def _or_minus_one(value):
+    return -1 if value is None else value
+
+def _countdown(countdown):
+    return -1.0 if countdown.p is None else countdown.p, _or_minus_one(countdown.left)
+
+def _set_countdown(countdown, p, left):
+    countdown.p = None if p < 0 else p
+    countdown.left = None if left < 0 else left
+
+def _arrays(state):
+    # Every per-cell array, in save order
+    snake = state.snake
+    free_cells = state.free_cells
+    return (snake.body, snake.occupancy, free_cells.cells, free_cells.slot, free_cells.blockers)
+
+def _chunks(data, previous):
+    # `data` split into CHUNK pieces, reusing the pieces of `previous` that match
+    view = memoryview(data).cast("B")
+    chunks = []
+    for i, start in enumerate(range(0, len(view), CHUNK)):
+        # Copy, then compare: bytes compare with memcmp, memoryviews item by item
+        piece = view[start:start + CHUNK].tobytes()
+        if previous is not None and i < len(previous) and piece == previous[i]:
+            piece = previous[i]
+        chunks.append(piece)
+    return tuple(chunks)
+
+class SaveState:
+    __slots__ = ("tick", "header", "arrays")
+
+    def __init__(self, tick, header, arrays):
+        self.tick = tick
+        self.header = header
+        self.arrays = arrays  # Tuple of chunks per array
+
+    def to_bytes(self):
+        arrays = b"".join(b"".join(chunks) for chunks in self.arrays)
+        return (FILE_HEADER.pack(MAGIC, VERSION, len(self.header)) + self.header +
+                zlib.compress(arrays, 1))
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, header_size = FILE_HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("not a saved game")
+        if version != VERSION:
+            raise ValueError(f"unsupported save version {version}")
+        header = data[FILE_HEADER.size:FILE_HEADER.size + header_size]
+        arrays = zlib.decompress(data[FILE_HEADER.size + header_size:])
+        _, width, height, tick = GAME.unpack_from(header)[:4]
+        # Split by the sizes the arrays have on a board this size
+        sizes = [len(memoryview(a).cast("B")) for a in _arrays(GameState(width, height, seed=0))]
+        split = []
+        pos = 0
+        for size in sizes:
+            split.append(_chunks(arrays[pos:pos + size], None))
+            pos += size
+        return cls(tick, bytes(header), tuple(split))
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+def save_state(state, previous=None):
+    # SaveState of `state`; pass the last save of the same game as
+    # `previous` to share its unchanged chunks
+    snake = state.snake
+    strawberry = state.strawberry.position
+    out = [
+        GAME.pack(state.seed, state.width, state.height, state.tick, state.time, state.score,
+                  state.level, state.snake_wait, state.game_over, DEATH_CODES[state.death_cause],
+                  state.invader_spawn_rate, state.invader_speed_multiplier, state.max_invaders,
+                  state.invader_fire_rate, state.level_spawn_rate_step, state.level_speed_step,
+                  state.invaders.spawned, state.powerups.spawned, state.bullets.spawned,
+                  state.free_cells.count),
+        SCHEDULE.pack(*_countdown(state.invader_spawns), *_countdown(state.powerup_spawns),
+                      state.fire_schedule_rate),
+        SNAKE.pack(snake.size, snake.head_index, snake.head_cell, snake.vacated, snake.moves,
+                   snake.length, -1 if strawberry is None else strawberry[1] * state.width + strawberry[0],
+                   DIRECTION_CODES[snake.direction], len(snake.turns), snake.growing,
+                   snake.speed_boost, snake.shield_active, snake.shield_timer, snake.can_shoot,
+                   snake.bullet_timer, snake.shot_cooldown, snake.last_shot_time,
+                   isinstance(snake.last_shot_time, float)),
+        bytes(DIRECTION_CODES[direction] for direction, stamp in snake.turns),
+        COUNTS.pack(len(state.invaders), len(state.powerups), len(state.bullets)),
+    ]
+    out.extend(INVADER.pack(i.uid, i.grid_x, i.grid_y, i.prev_y, i.speed, _or_minus_one(i.fire_tick))
+               for i in state.invaders)
+    out.extend(POWERUP.pack(p.uid, POWERUP_CODES[p.type], p.grid_x, p.grid_y, p.prev_y, p.speed,
+                            p.active_time) for p in state.powerups)
+    out.extend(BULLET.pack(b.uid, b.x, b.y, b.prev_y, b.direction, b.speed) for b in state.bullets)
+    version, internal, gauss = state.rng.getstate()
+    out.append(RNG.pack(version, *internal))
+    out.append(struct.pack("<?d", gauss is not None, gauss or 0.0))
+
+    old = previous.arrays if previous is not None else (None,) * 5
+    arrays = tuple(_chunks(a, p) for a, p in zip(_arrays(state), old))
+    return SaveState(state.tick, b"".join(out), arrays)
+
+def restore_state(save, state=None):
+    # Put the game back as it was when `save` was made, in place if a
+    # state of the same board size is given (renderers and other holders
+    # of it stay valid), otherwise in a new GameState. Returns the state.
+    header = save.header
+    (seed, width, height, tick, time, score, level, snake_wait, game_over, death,
+     spawn_rate, speed_multiplier, max_invaders, fire_rate, spawn_rate_step, speed_step,
+     invader_uids, powerup_uids, bullet_uids, free_count) = GAME.unpack_from(header)
+    if state is None or (state.width, state.height) != (width, height):
+        state = GameState(width, height, seed=seed)
+    state.seed = seed
+    state.tick = tick
+    state.time = time
+    state.score = score
+    state.level = level
+    state.snake_wait = snake_wait
+    state.game_over = bool(game_over)
+    state.death_cause = CODE_DEATHS[death]
+    state.invader_spawn_rate = spawn_rate
+    state.invader_speed_multiplier = speed_multiplier
+    state.max_invaders = max_invaders
+    state.invader_fire_rate = fire_rate
+    state.level_spawn_rate_step = spawn_rate_step
+    state.level_speed_step = speed_step
+    state.events = []
+    pos = GAME.size
+    invader_rate, invader_left, powerup_rate, powerup_left, fire_rate = SCHEDULE.unpack_from(header, pos)
+    pos += SCHEDULE.size
+    _set_countdown(state.invader_spawns, invader_rate, invader_left)
+    _set_countdown(state.powerup_spawns, powerup_rate, powerup_left)
+    state.fire_schedule_rate = fire_rate
+
+    snake = state.snake
+    (snake.size, snake.head_index, snake.head_cell, snake.vacated, snake.moves, snake.length,
+     strawberry, direction, n_turns, growing, snake.speed_boost, shield, snake.shield_timer,
+     can_shoot, snake.bullet_timer, snake.shot_cooldown, last_shot, shot_is_float) = SNAKE.unpack_from(header, pos)
+    pos += SNAKE.size
+    snake.last_shot_time = last_shot if shot_is_float else int(last_shot)
+    snake.direction = CODE_DIRECTIONS[direction]
+    snake.growing = bool(growing)
+    snake.shield_active = bool(shield)
+    snake.can_shoot = bool(can_shoot)
+    snake.turns = deque((CODE_DIRECTIONS[code], None) for code in header[pos:pos + n_turns])
+    snake.turn_stamp = None
+    pos += n_turns
+    state.strawberry.position = None if strawberry < 0 else (strawberry % width, strawberry // width)
+
+    n_invaders, n_powerups, n_bullets = COUNTS.unpack_from(header, pos)
+    pos += COUNTS.size
+    invaders = state.invaders
+    invaders.clear()
+    state.fire_timers.clear()
+    for _ in range(n_invaders):
+        uid, x, y, prev_y, speed, fire_tick = INVADER.unpack_from(header, pos)
+        pos += INVADER.size
+        invader = invaders.restore(uid)
+        invader.grid_x, invader.grid_y, invader.prev_y, invader.speed = x, y, prev_y, speed
+        invader.width, invader.height = width, height
+        invader.cell = int(y) * width + x
+        invader.fire_tick = None if fire_tick < 0 else fire_tick
+        if invader.fire_tick is not None:
+            state.fire_timers.push(fire_tick, uid, invader)
+    invaders.spawned = invader_uids
+    powerups = state.powerups
+    powerups.clear()
+    for _ in range(n_powerups):
+        uid, code, x, y, prev_y, speed, active_time = POWERUP.unpack_from(header, pos)
+        pos += POWERUP.size
+        powerup = powerups.restore(uid)
+        powerup.type = CODE_POWERUPS[code]
+        powerup.grid_x, powerup.grid_y, powerup.prev_y, powerup.speed = x, y, prev_y, speed
+        powerup.active_time = active_time
+        powerup.width, powerup.height = width, height
+        powerup.cell = int(y) * width + x
+    powerups.spawned = powerup_uids
+    bullets = state.bullets
+    bullets.clear()
+    for _ in range(n_bullets):
+        uid, x, y, prev_y, direction, speed = BULLET.unpack_from(header, pos)
+        pos += BULLET.size
+        bullet = bullets.restore(uid)
+        bullet.reset((x, y), direction)
+        bullet.prev_y, bullet.speed = prev_y, speed
+    bullets.spawned = bullet_uids
+
+    rng = RNG.unpack_from(header, pos)
+    pos += RNG.size
+    has_gauss, gauss = struct.unpack_from("<?d", header, pos)
+    state.rng.setstate((rng[0], rng[1:], gauss if has_gauss else None))
+
+    for target, chunks in zip(_arrays(state), save.arrays):
+        view = memoryview(target).cast("B")
+        start = 0
+        for chunk in chunks:
+            view[start:start + len(chunk)] = chunk
+            start += len(chunk)
+    state.free_cells.count = free_count
+    return state
+
+class StateHistory:
+    # Ring of saves of the last `size` ticks of one game, for rolling back
+    def __init__(self, size=64):
+        self.saves = deque(maxlen=size)
+
+    def __len__(self):
+        return len(self.saves)
+
+    def push(self, state):
+        save = save_state(state, self.saves[-1] if self.saves else None)
+        self.saves.append(save)
+        return save
+
+    def get(self, tick):
+        # The save made at `tick`, or None if it has dropped out of the ring
+        if not self.saves or not self.saves[0].tick <= tick <= self.saves[-1].tick:
+            return None
+        for save in reversed(self.saves):
+            if save.tick == tick:
+                return save
+        return None
+
+    def rollback(self, state, tick):
+        # Restore `state` to `tick` and forget the saves after it
+        save = self.get(tick)
+        if save is None:
+            raise KeyError(f"no save for tick {tick}")
+        while self.saves[-1] is not save:
+            self.saves.pop()
+        return restore_state(save, state)
@@ -0,0 +1,66 @@
+import heapq
+import math
+
+# Scheduling for rare random events. Rolling for an event of probability
+# p on every frame wastes about 1/p - 1 random numbers per event; the
+# number of rolls up to and including the first success is geometrically
+# distributed, so it can be drawn once and counted down instead. The
+# geometric distribution is memoryless, so throwing away a countdown and
+# drawing a new one (when p changes, say) leaves the odds of every later
+# frame exactly as if it had been rolled for.
+
+def geometric(rng, p):
+    # Trials up to and including the first success of a trial that
+    # succeeds with probability p, from one random number; None if it
+    # never succeeds
+    if p >= 1.0:
+        return 1
+    if p <= 0.0:
+        return None
+    return int(math.log(1.0 - rng.random()) / math.log(1.0 - p)) + 1
+
+class Countdown:
+    # A repeated trial of probability p, such as an invader spawn roll:
+    # trial() is True as often as rolling each time would be, but draws a
+    # random number only on success or when p changes
+    __slots__ = ("p", "left")
+
+    def __init__(self):
+        self.p = None  # Probability `left` was drawn for
+        self.left = None  # Trials to the next success, None if never
+
+    def trial(self, rng, p):
+        if p != self.p:
+            self.p = p
+            self.left = geometric(rng, p)
+        if self.left is None:
+            return False
+        self.left -= 1
+        if self.left:
+            return False
+        self.left = geometric(rng, p)
+        return True
+
+class TimerQueue:
+    # Min-heap of (tick, key, item) timers; keys must be unique so items
+    # are never compared. Timers aren't cancelled: the owner checks that
+    # what pop_due() returns is still current and skips it otherwise.
+    def __init__(self):
+        self.heap = []
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, tick, key, item):
+        heapq.heappush(self.heap, (tick, key, item))
+
+    def pop_due(self, tick):
+        # Timers due at or before `tick`, earliest first
+        heap = self.heap
+        due = []
+        while heap and heap[0][0] <= tick:
+            due.append(heapq.heappop(heap))
+        return due
+
+    def clear(self):
+        self.heap.clear()
@@ -0,0 +1,238 @@
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+from game_core import GRID_WIDTH, GRID_HEIGHT, SIM_DT, SIM_RATE, Action, SharedState, board_size, step_shared
+from netcode import (HELLO, HELLO_BODY, INPUT, MAX_CLIENT_FRAME, SNAPSHOT, WELCOME, WELCOME_BODY,
+                     ALIVE, CONNECTED, SnapshotHistory, decode_input, frame, read_frame)
+from profiling import Histogram
+
+# Authoritative multiplayer server. Players are grouped into rooms, and
+# the players of a room share one board (game_core.SharedState): each has
+# a snake on it, and they eat the same strawberries and dodge the same
+# invaders. Players can join a room until it is full or its game is over.
+# The server runs every room at the fixed SIM_RATE, applies the input
+# clients send, and sends each client a snapshot of its room `rate` times
+# a second (see netcode.py for the wire format).
+
+DEFAULT_PORT = 7777
+ROOM_SIZE = 4
+SNAPSHOT_RATE = 20  # Snapshots per second
+MAX_BUFFERED = 64 * 1024  # Bytes waiting for a slow client before snapshots are skipped
+MAX_TURNS_PER_TICK = 8
+STATS_INTERVAL = 5.0  # Seconds between load reports
+
+class Player:
+    def __init__(self, index, writer):
+        self.index = index  # Seat on the room's board
+        self.writer = writer
+        self.action = Action()  # Input received since the last tick
+        self.history = SnapshotHistory()
+        self.connected = True
+
+class Room:
+    def __init__(self, room_id, seed, board, size):
+        self.id = room_id
+        self.seed = seed
+        self.board = board
+        self.size = size
+        self.state = SharedState(*board, seed=seed)
+        self.players = []
+
+    @property
+    def open(self):
+        # Whether a player can still join
+        return len(self.players) < self.size and not self.state.game_over
+
+    @property
+    def empty(self):
+        return not any(player.connected for player in self.players)
+
+    def join(self, writer):
+        # The first player takes the seat the board starts with; None if
+        # there is no room left on the board
+        index = self.state.add_seat() if self.players else 0
+        if index is None:
+            return None
+        player = Player(index, writer)
+        self.players.append(player)
+        return player
+
+    def leave(self, player):
+        player.connected = False
+        self.state.knock_out(player.index)
+
+    def tick(self):
+        step_shared(self.state, [player.action for player in self.players])
+        for player in self.players:
+            player.action = Action()
+
+    def scoreboard(self):
+        return [(seat.score, (0 if seat.out else ALIVE) | (CONNECTED if player.connected else 0))
+                for seat, player in zip(self.state.seats, self.players)]
+
+    def broadcast(self, stats):
+        scoreboard = self.scoreboard()
+        for player in self.players:
+            if not player.connected or player.writer.is_closing():
+                continue
+            if player.writer.transport.get_write_buffer_size() > MAX_BUFFERED:
+                # The next snapshot is a delta against what it acknowledged,
+                # so skipping this one loses nothing
+                stats.skipped += 1
+                continue
+            data = frame(SNAPSHOT, player.history.encode(self.state, player.index, scoreboard))
+            player.writer.write(data)
+            stats.bytes_out += len(data)
+            stats.snapshots += 1
+
+class ServerStats:
+    def __init__(self):
+        self.tick_times = Histogram(20, 1 / 64000.0)
+        self.clear()
+
+    def clear(self):
+        self.tick_times.clear()
+        self.started = time.perf_counter()
+        self.busy = 0.0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.snapshots = 0
+        self.skipped = 0
+        self.late = 0  # Ticks that started after the next one was due
+
+    def report(self, rooms, players):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        times = self.tick_times
+        return (f"{rooms} rooms, {players} players: tick mean {times.mean() * 1000:.2f}ms "
+                f"p95<={times.percentile(95) * 1000:.2f}ms max {times.max * 1000:.2f}ms, "
+                f"load {self.busy / elapsed:.0%} (~{rooms * elapsed / max(self.busy, 1e-9):.0f} rooms at 100%), "
+                f"late {self.late}, "
+                f"out {self.bytes_out / elapsed / 1024:.1f} KiB/s "
+                f"({self.bytes_out / max(self.snapshots, 1):.0f} B/snapshot), "
+                f"in {self.bytes_in / elapsed / 1024:.1f} KiB/s, skipped {self.skipped}")
+
+class Server:
+    def __init__(self, board=(GRID_WIDTH, GRID_HEIGHT), room_size=ROOM_SIZE, rate=SNAPSHOT_RATE,
+                 seed=None, quiet=False):
+        self.board = board
+        self.room_size = room_size
+        self.rate = rate
+        self.seed = seed
+        self.quiet = quiet
+        self.rooms = {}
+        self.next_room = 0
+        self.stats = ServerStats()
+
+    def find_room(self, room_id):
+        # The requested room if it exists and is open, otherwise the
+        # newest open room, otherwise a new room
+        room = self.rooms.get(room_id)
+        if room is not None and room.open:
+            return room
+        for room in reversed(list(self.rooms.values())):
+            if room.open:
+                return room
+        room_id = self.next_room
+        self.next_room += 1
+        seed = random.randrange(1 << 32) if self.seed is None else self.seed + room_id
+        room = self.rooms[room_id] = Room(room_id, seed, self.board, self.room_size)
+        return room
+
+    async def handle_client(self, reader, writer):
+        player = room = None
+        try:
+            kind, payload = await read_frame(reader, MAX_CLIENT_FRAME)
+            if kind != HELLO or len(payload) != HELLO_BODY.size:
+                return
+            room = self.find_room(HELLO_BODY.unpack(payload)[0])
+            player = room.join(writer)
+            if player is None:
+                return
+            writer.write(frame(WELCOME, WELCOME_BODY.pack(
+                player.index, room.id, room.seed, room.board[0], room.board[1], room.size)))
+            while True:
+                kind, payload = await read_frame(reader, MAX_CLIENT_FRAME)
+                self.stats.bytes_in += len(payload) + 5
+                if kind != INPUT:
+                    continue
+                ack, action = decode_input(payload)
+                player.history.acknowledge(ack)
+                turns = player.action.turns
+                turns.extend(action.turns[:MAX_TURNS_PER_TICK - len(turns)])
+                player.action.shoot = player.action.shoot or action.shoot
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            if player is not None:
+                room.leave(player)
+                if room.empty:
+                    del self.rooms[room.id]
+            writer.close()
+
+    async def run_ticks(self):
+        # Fixed-timestep loop for every room; a snapshot goes out on the
+        # ticks where the snapshot clock passes a whole number
+        stats = self.stats
+        clock = time.perf_counter
+        next_tick = clock()
+        next_report = next_tick + STATS_INTERVAL
+        tick = 0
+        while True:
+            now = clock()
+            if now < next_tick:
+                await asyncio.sleep(next_tick - now)
+            elif now - next_tick > SIM_DT:
+                stats.late += 1
+            start = clock()
+            tick += 1
+            snapshot = tick * self.rate // SIM_RATE != (tick - 1) * self.rate // SIM_RATE
+            for room in list(self.rooms.values()):
+                room.tick()
+                if snapshot:
+                    room.broadcast(stats)
+            elapsed = clock() - start
+            stats.busy += elapsed
+            stats.tick_times.record(elapsed)
+            next_tick += SIM_DT
+            if next_tick < start - 1.0:
+                next_tick = start  # Hopelessly behind; don't try to catch up
+            if start >= next_report:
+                if not self.quiet:
+                    players = sum(player.connected for room in self.rooms.values() for player in room.players)
+                    print(stats.report(len(self.rooms), players), flush=True)
+                stats.clear()
+                next_report = start + STATS_INTERVAL
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_client, host, port)
+        if not self.quiet:
+            print(f"Serving on {host}:{port}", flush=True)
+        async with server:
+            await self.run_ticks()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cosmic Snake multiplayer server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--board", type=board_size, default=(GRID_WIDTH, GRID_HEIGHT), metavar="WxH",
+                        help=f"board size in cells (default: {GRID_WIDTH}x{GRID_HEIGHT})")
+    parser.add_argument("--room-size", type=int, default=ROOM_SIZE, help="players per room")
+    parser.add_argument("--rate", type=int, default=SNAPSHOT_RATE,
+                        help=f"snapshots per second, at most {SIM_RATE} (default: {SNAPSHOT_RATE})")
+    parser.add_argument("--seed", type=int, help="seed for room 0 (room n uses seed+n)")
+    args = parser.parse_args(argv)
+    if not 1 <= args.rate <= SIM_RATE:
+        parser.error(f"--rate must be between 1 and {SIM_RATE}")
+
+    server = Server(args.board, args.room_size, args.rate, args.seed)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
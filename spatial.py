@@ -0,0 +1,91 @@
+import random
+from array import array
+
+# Grid bookkeeping shared by the simulation: which cells are free, and
+# later which entities sit in which cell. Cells are packed indices
+# (y * width + x), the same encoding Snake uses for its body.
+
+class FreeCellIndex:
+    # Indexable set of unoccupied cells. `cells` is a permutation of every
+    # cell on the board whose first `count` entries are the free ones, and
+    # `slot` maps a cell back to its position in `cells`, so a cell can be
+    # moved in or out of the free prefix with one swap. A cell stays taken
+    # while anything (snake segment, invader, powerup) is counted on it.
+    def __init__(self, n_cells):
+        self.cells = array("i", range(n_cells))
+        self.slot = array("i", range(n_cells))
+        self.blockers = array("H", bytes(2 * n_cells))
+        self.count = n_cells
+
+    def __len__(self):
+        return self.count
+
+    def is_free(self, cell):
+        return self.blockers[cell] == 0
+
+    def occupy(self, cell):
+        self.blockers[cell] += 1
+        if self.blockers[cell] == 1:
+            self.count -= 1
+            self._swap(self.slot[cell], self.count)
+
+    def release(self, cell):
+        self.blockers[cell] -= 1
+        if self.blockers[cell] == 0:
+            self._swap(self.slot[cell], self.count)
+            self.count += 1
+
+    def move(self, old_cell, new_cell):
+        if old_cell != new_cell:
+            self.occupy(new_cell)
+            self.release(old_cell)
+
+    def sample(self, rng=random):
+        # Uniformly random free cell, or None when the board is full
+        if not self.count:
+            return None
+        return self.cells[rng.randrange(self.count)]
+
+    def _swap(self, i, j):
+        cells = self.cells
+        a = cells[i]
+        b = cells[j]
+        cells[i] = b
+        cells[j] = a
+        self.slot[b] = i
+        self.slot[a] = j
+
+class CollisionGrid:
+    # Uniform grid of buckets, one per board cell, holding the entities
+    # whose cell rect covers it. Lookups by cell or by the handful of cells
+    # a rect overlaps replace scanning every entity.
+    def __init__(self):
+        self.buckets = {}
+
+    def clear(self):
+        self.buckets.clear()
+
+    def insert(self, cell, item):
+        bucket = self.buckets.get(cell)
+        if bucket is None:
+            self.buckets[cell] = [item]
+        else:
+            bucket.append(item)
+
+    def remove(self, cell, item):
+        bucket = self.buckets[cell]
+        bucket.remove(item)
+        if not bucket:
+            del self.buckets[cell]
+
+    def get(self, cell):
+        return self.buckets.get(cell, ())
+
+    def first(self, cells):
+        # First entity found in any of the given cells, or None
+        buckets = self.buckets
+        for cell in cells:
+            bucket = buckets.get(cell)
+            if bucket:
+                return bucket[0]
+        return None
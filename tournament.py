@@ -0,0 +1,172 @@
+import argparse
+import csv
+import os
+import sys
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from controllers import CONTROLLERS, load_controller
+from game_core import GRID_WIDTH, GRID_HEIGHT, SIM_RATE, GameState, board_size, step
+
+# Plays many headless games across a process pool. Games are handed out
+# to the workers in batches of seeds and their results streamed back as
+# each batch finishes, so millions of games need neither a result list in
+# memory nor one round trip per game.
+
+GameResult = namedtuple("GameResult", "seed score level ticks death")
+
+MAX_TICKS = 30 * 60 * SIM_RATE  # Games still going after 30 minutes are stopped
+
+def play_game(factory, seed, overrides=(), max_ticks=MAX_TICKS, board=(GRID_WIDTH, GRID_HEIGHT)):
+    state = GameState(*board, seed=seed)
+    for name, value in overrides:
+        setattr(state, name, value)
+    controller = factory(seed)
+    while not state.game_over and state.tick < max_ticks:
+        step(state, controller(state))
+    death = state.death_cause.name.lower() if state.death_cause else "timeout"
+    return GameResult(seed, state.score, state.level, state.tick, death)
+
+def play_batch(spec, seeds, overrides, max_ticks, board):
+    # Runs in a worker; spec is a controller name/"module:factory" or a
+    # picklable factory
+    factory = load_controller(spec) if isinstance(spec, str) else spec
+    return [play_game(factory, seed, overrides, max_ticks, board) for seed in seeds]
+
+class TournamentStats:
+    # Running totals; scores and levels are kept as histograms, which stay
+    # small however many games are added
+    def __init__(self):
+        self.games = 0
+        self.ticks = 0
+        self.scores = Counter()
+        self.levels = Counter()
+        self.deaths = Counter()
+
+    def add(self, result):
+        self.games += 1
+        self.ticks += result.ticks
+        self.scores[result.score] += 1
+        self.levels[result.level] += 1
+        self.deaths[result.death] += 1
+
+    def score_percentile(self, p):
+        rank = p / 100.0 * self.games
+        seen = 0
+        for score in sorted(self.scores):
+            seen += self.scores[score]
+            if seen >= rank:
+                return score
+        return 0
+
+    def mean(self, counter):
+        return sum(value * n for value, n in counter.items()) / max(self.games, 1)
+
+    def report(self, elapsed=None):
+        lines = [
+            f"games:  {self.games}",
+            f"score:  mean {self.mean(self.scores):.1f}  p10 {self.score_percentile(10)}"
+            f"  median {self.score_percentile(50)}  p90 {self.score_percentile(90)}"
+            f"  max {max(self.scores, default=0)}",
+            f"level:  mean {self.mean(self.levels):.2f}  max {max(self.levels, default=0)}",
+            f"ticks:  mean {self.ticks / max(self.games, 1):.0f}"
+            f" ({self.ticks / max(self.games, 1) / SIM_RATE:.1f}s of play)",
+            "deaths: " + "  ".join(f"{death} {n / max(self.games, 1):.1%}"
+                                   for death, n in self.deaths.most_common()),
+        ]
+        if elapsed:
+            lines.append(f"speed:  {self.games / elapsed:.0f} games/s, {self.ticks / elapsed:.0f} ticks/s")
+        return "\n".join(lines)
+
+def run_tournament(controller, games, seed=0, jobs=None, batch_size=64, overrides=(),
+                   max_ticks=MAX_TICKS, board=(GRID_WIDTH, GRID_HEIGHT), on_batch=None):
+    # Plays seeds seed .. seed+games-1 and returns a TournamentStats.
+    # controller is a name, "module:factory" or a module-level factory
+    # taking a seed. on_batch, if given, receives each finished batch of
+    # GameResults (in completion order, not seed order).
+    jobs = jobs or os.cpu_count() or 1
+    overrides = tuple(overrides)
+    stats = TournamentStats()
+    batches = ((range(start, min(start + batch_size, seed + games)))
+               for start in range(seed, seed + games, batch_size))
+
+    with ProcessPoolExecutor(jobs) as pool:
+        # Keep a few batches per worker queued rather than submitting them all
+        pending = set()
+        for batch in batches:
+            pending.add(pool.submit(play_batch, controller, batch, overrides, max_ticks, board))
+            if len(pending) < jobs * 4:
+                continue
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                _collect(future.result(), stats, on_batch)
+        for future in wait(pending).done:
+            _collect(future.result(), stats, on_batch)
+    return stats
+
+def _collect(results, stats, on_batch):
+    for result in results:
+        stats.add(result)
+    if on_batch:
+        on_batch(results)
+
+def parse_override(text):
+    # "name=value" for a numeric GameState attribute
+    name, sep, value = text.partition("=")
+    defaults = GameState(seed=0)
+    if not sep or not isinstance(getattr(defaults, name, None), (int, float)):
+        raise argparse.ArgumentTypeError(f"expected NAME=NUMBER for a numeric GameState attribute, got {text!r}")
+    try:
+        return name, type(getattr(defaults, name))(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a number: {value!r}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play many headless games in parallel")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--controller", default="random",
+                        help=f"{', '.join(CONTROLLERS)} or module:factory (default: random)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game")
+    parser.add_argument("--jobs", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--batch-size", type=int, default=64, help="games per task sent to a worker")
+    parser.add_argument("--max-ticks", type=int, default=MAX_TICKS,
+                        help="stop games that last longer (reported as 'timeout')")
+    parser.add_argument("--board", type=board_size, default=(GRID_WIDTH, GRID_HEIGHT), metavar="WxH",
+                        help=f"board size in cells (default: {GRID_WIDTH}x{GRID_HEIGHT})")
+    parser.add_argument("--set", dest="overrides", action="append", type=parse_override, default=[],
+                        metavar="NAME=VALUE",
+                        help="override a GameState setting for every game, e.g. invader_fire_rate=0.01")
+    parser.add_argument("--out", metavar="FILE", help="write one CSV row per game to FILE")
+    args = parser.parse_args(argv)
+
+    load_controller(args.controller)  # Fail here rather than in every worker
+    out = writer = None
+    if args.out:
+        out = open(args.out, "w", newline="")
+        writer = csv.writer(out)
+        writer.writerow(GameResult._fields)
+
+    start = time.perf_counter()
+    progress = [0, start]  # Games seen, time of the last progress line
+
+    def on_batch(results):
+        if writer:
+            writer.writerows(results)
+        progress[0] += len(results)
+        now = time.perf_counter()
+        if now - progress[1] >= 2.0:
+            progress[1] = now
+            print(f"{progress[0]}/{args.games} games", file=sys.stderr, flush=True)
+
+    try:
+        stats = run_tournament(args.controller, args.games, args.seed, args.jobs, args.batch_size,
+                               args.overrides, args.max_ticks, args.board, on_batch)
+    finally:
+        if out:
+            out.close()
+    print(stats.report(time.perf_counter() - start))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())